@@ -1,9 +1,32 @@
+import gc
+import hashlib
+import inspect
+import json
+import math
+import mmap
+import os
+import pickle
+import platform
+import statistics
+import struct
+import sys
+import random
+import tracemalloc
+from array import array
+from bisect import bisect_right
 from datetime import date
-from faker import Faker
-from collections import namedtuple, Counter
-from functools import wraps
+from collections import namedtuple, Counter, OrderedDict, deque
+from collections.abc import AsyncIterator, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from functools import wraps, lru_cache
+from itertools import accumulate, chain, islice, repeat
+from operator import add, attrgetter, itemgetter, mod, mul, sub, truediv
 from time import perf_counter
-from typing import Tuple, Optional, Dict, List
+from typing import TYPE_CHECKING, Tuple, Optional, Dict, List
+
+if TYPE_CHECKING:
+    from faker import Faker
 
 """
 --------------------------------------------------------------------------------------------------------------
@@ -12,24 +35,334 @@ from typing import Tuple, Optional, Dict, List
 --------------------------------------------------------------------------------------------------------------
 """
 
-# Creating Faker instance
-fake = Faker()
+# Providers used by `profile()` and `company()`. Loading only these instead of Faker's full default set,
+# and only on first use, keeps importing this module cheap.
+_FAKER_PROVIDERS = (
+    'faker.providers.address',
+    'faker.providers.company',
+    'faker.providers.date_time',
+    'faker.providers.geo',
+    'faker.providers.internet',
+    'faker.providers.job',
+    'faker.providers.person',
+    'faker.providers.profile',
+    'faker.providers.ssn',
+)
+
+def _new_faker() -> 'Faker':
+    """Imports Faker and creates an instance with only the providers this module uses."""
+    from faker import Faker
+    return Faker(providers=list(_FAKER_PROVIDERS))
+
+@lru_cache(maxsize=1)
+def _get_faker() -> 'Faker':
+    """Returns the shared Faker instance, creating it on first use."""
+    return _new_faker()
+
+def __getattr__(name: str):
+    # The module-level `fake` instance is created lazily on first access
+    if name == 'fake':
+        return _get_faker()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # Define namedtuple
 Profile = namedtuple('Profile', 'blood_type latitude longitude age')
 
-def generate_profiles_namedtuple(n: int) -> tuple:
+# Blood groups Faker draws from, in a fixed order so they can be used as dictionary codes
+BLOOD_TYPES = ('A+', 'A-', 'B+', 'B-', 'AB+', 'AB-', 'O+', 'O-')
+
+class _SlottedRecord:
+    """
+    Base for compact record types that follow the namedtuple protocol.
+
+    Subclasses store their fields in `__slots__` (no per-instance `__dict__`), so any function written
+    against a namedtuple's attributes accepts them unchanged. Iteration, equality, `_fields`, `_make`,
+    `_asdict` and `_replace` behave like the namedtuple equivalents.
+    """
+    __slots__ = ()
+    _fields = ()
+
+    @classmethod
+    def _make(cls, iterable):
+        return cls(*iterable)
+
+    def _asdict(self) -> Dict:
+        return {field: getattr(self, field) for field in self._fields}
+
+    def _replace(self, **changes):
+        values = self._asdict()
+        values.update(changes)
+        return type(self)(**values)
+
+    def __iter__(self):
+        return (getattr(self, field) for field in self._fields)
+
+    def __len__(self) -> int:
+        return len(self._fields)
+
+    def __eq__(self, other) -> bool:
+        if type(other) is not type(self):
+            return NotImplemented
+        return tuple(self) == tuple(other)
+
+    def __hash__(self) -> int:
+        return hash(tuple(self))
+
+    def __repr__(self) -> str:
+        fields = ', '.join(f'{field}={getattr(self, field)!r}' for field in self._fields)
+        return f'{type(self).__name__}({fields})'
+
+    def __getstate__(self):
+        return tuple(self)
+
+    def __setstate__(self, state):
+        for field, value in zip(self._fields, state):
+            setattr(self, field, value)
+
+class ProfileRecord(_SlottedRecord):
+    """
+    Slotted drop-in for the Profile namedtuple.
+
+    Blood types are interned, so every record with the same blood type shares one string object, and
+    coordinates are stored as floats rather than the much larger Decimals Faker returns.
+    """
+    __slots__ = Profile._fields
+    _fields = Profile._fields
+
+    def __init__(self, blood_type: str, latitude: float, longitude: float, age: int):
+        self.blood_type = sys.intern(blood_type)
+        self.latitude = float(latitude)
+        self.longitude = float(longitude)
+        self.age = age
+
+def to_profile_records(profiles) -> Tuple[ProfileRecord, ...]:
+    """
+    Converts Profile namedtuples (or any rows with the Profile fields in order) to ProfileRecords.
+
+    Args:
+        profiles: An iterable of Profile namedtuples.
+
+    Returns:
+        Tuple[ProfileRecord, ...]: The same rows as slotted records.
+    """
+    return tuple(map(ProfileRecord._make, profiles))
+
+class ProfileTable:
+    """
+    Columnar storage for profiles.
+
+    Each field is held in a contiguous typed `array` instead of one Python object per row:
+    blood types are dictionary-encoded to one byte per row, latitude and longitude are float64
+    and age is an unsigned 16-bit integer. The namedtuple metric functions accept a ProfileTable
+    and work directly on the columns. Tables opened with `load_profiles` hold read-only memoryviews
+    over a memory-mapped file in place of the arrays.
+
+    Attributes:
+        blood_types (List[str]): Dictionary of blood types, indexed by code.
+        blood_codes (array): Blood type code of each row ('B').
+        latitudes (array): Latitude of each row ('d').
+        longitudes (array): Longitude of each row ('d').
+        ages (array): Age of each row ('H').
+    """
+    __slots__ = ('blood_types', 'blood_codes', 'latitudes', 'longitudes', 'ages', '_codes')
+
+    def __init__(self, blood_types: Tuple[str, ...] = BLOOD_TYPES):
+        self.blood_types = list(blood_types)
+        self._codes = {blood_type: code for code, blood_type in enumerate(self.blood_types)}
+        self.blood_codes = array('B')
+        self.latitudes = array('d')
+        self.longitudes = array('d')
+        self.ages = array('H')
+
+    @classmethod
+    def from_profiles(cls, profiles) -> 'ProfileTable':
+        """
+        Builds a ProfileTable from Profile namedtuples or profile dictionaries.
+
+        Args:
+            profiles: An iterable of Profile namedtuples or dictionaries with the Profile keys.
+
+        Returns:
+            ProfileTable: A table holding the same rows.
+        """
+        table = cls()
+        append = table.append
+        for profile in profiles:
+            if isinstance(profile, dict):
+                append(profile['blood_type'], profile['latitude'], profile['longitude'], profile['age'])
+            else:
+                append(profile.blood_type, profile.latitude, profile.longitude, profile.age)
+        return table
+
+    def _code(self, blood_type: str) -> int:
+        code = self._codes.get(blood_type)
+        if code is None:
+            code = self._codes[blood_type] = len(self.blood_types)
+            self.blood_types.append(blood_type)
+        return code
+
+    def append(self, blood_type: str, latitude: float, longitude: float, age: int) -> None:
+        """Appends one row to the table, adding `blood_type` to the dictionary if it is new."""
+        self.blood_codes.append(self._code(blood_type))
+        self.latitudes.append(float(latitude))
+        self.longitudes.append(float(longitude))
+        self.ages.append(age)
+
+    def extend(self, other: 'ProfileTable') -> None:
+        """Appends all rows of another table, re-encoding its blood type codes if the dictionaries differ."""
+        if other.blood_types == self.blood_types:
+            self.blood_codes.extend(other.blood_codes)
+        else:
+            mapping = bytes(self._code(blood_type) for blood_type in other.blood_types)
+            table = mapping + bytes(256 - len(mapping))
+            self.blood_codes.frombytes(bytes(other.blood_codes).translate(table))
+        self.latitudes.extend(other.latitudes)
+        self.longitudes.extend(other.longitudes)
+        self.ages.extend(other.ages)
+
+    def blood_type_counts(self) -> Dict[str, int]:
+        """Returns the number of rows for each blood type present in the table."""
+        raw = bytes(self.blood_codes)
+        counts = {}
+        for code, blood_type in enumerate(self.blood_types):
+            count = raw.count(code.to_bytes(1, 'little'))
+            if count:
+                counts[blood_type] = count
+        return counts
+
+    def __len__(self) -> int:
+        return len(self.blood_codes)
+
+    def __getitem__(self, index: int) -> Profile:
+        return Profile(
+            self.blood_types[self.blood_codes[index]],
+            self.latitudes[index],
+            self.longitudes[index],
+            self.ages[index]
+        )
+
+    def __iter__(self):
+        blood_types = self.blood_types
+        for code, latitude, longitude, age in zip(self.blood_codes, self.latitudes, self.longitudes, self.ages):
+            yield Profile(blood_types[code], latitude, longitude, age)
+
+@lru_cache(maxsize=1)
+def _ages_by_birth_day(today: date) -> Tuple[int, ...]:
+    """
+    Returns the age of someone born on each day of the range Faker's `date_of_birth` draws from.
+
+    Faker picks a birthdate uniformly between 116 years ago (exclusive) and today, so drawing uniformly
+    from this table gives exactly the same age distribution without building any date objects.
+    """
+    try:
+        start = today.replace(year=today.year - 116)
+    except ValueError:
+        start = today.replace(year=today.year - 116, day=28)
+    year_starts = [date(year, 1, 1).toordinal() for year in range(start.year + 1, today.year + 1)]
+    return tuple(
+        len(year_starts) - bisect_right(year_starts, ordinal)
+        for ordinal in range(start.toordinal() + 1, today.toordinal() + 1)
+    )
+
+def _draw_profile_columns(n: int, rng: random.Random) -> Tuple[List, List, List, List]:
+    """
+    Draws the four profile fields for `n` rows in bulk.
+
+    Only blood group, location and age are drawn, with the same distributions as `fake.profile()`:
+    a uniform blood group, latitude in [-90, 90], longitude in [-180, 180] and the age of a uniformly
+    drawn birthdate. Everything else `fake.profile()` builds (name, job, address, ...) is skipped.
+
+    Args:
+        n (int): Number of rows to draw.
+        rng (random.Random): Source of the draws.
+
+    Returns:
+        Tuple[List, List, List, List]: Blood types, latitudes, longitudes and ages.
+    """
+    draw = rng.random
+    blood_types = rng.choices(BLOOD_TYPES, k=n)
+    latitudes = [draw() * 180.0 - 90.0 for _ in range(n)]
+    longitudes = [draw() * 360.0 - 180.0 for _ in range(n)]
+    ages = rng.choices(_ages_by_birth_day(date.today()), k=n)
+    return blood_types, latitudes, longitudes, ages
+
+def _resolve_rng(seed: Optional[int], rng, stream: str, default=None):
+    """
+    Returns the random source for one generator call.
+
+    A seed is turned into a generator on the named stream, `random.Random(f"{seed}/{stream}")`, so different
+    generators given the same seed draw from independent streams. Without a seed or `rng` this returns
+    `default`, or a fresh unseeded generator.
+
+    Raises:
+        ValueError: If both `seed` and `rng` are given.
+    """
+    if rng is not None:
+        if seed is not None:
+            raise ValueError("pass either seed or rng, not both")
+        return rng
+    if seed is not None:
+        return random.Random(f"{seed}/{stream}")
+    return default if default is not None else random.Random()
+
+def _profile_rng(seed: Optional[int], rng=None) -> random.Random:
+    """
+    Returns the random source for profile draws.
+
+    Without a seed or `rng`, Faker's shared random instance is used, so `Faker.seed()` also makes unseeded
+    calls reproducible.
+    """
+    if seed is None and rng is None:
+        return _get_faker().random
+    return _resolve_rng(seed, rng, 'profiles')
+
+def _seeded_faker(rng) -> 'Faker':
+    """
+    Returns the Faker instance that draws from `rng`.
+
+    For the default random sources this is the shared instance. Otherwise it is a separate instance seeded
+    from `rng`, so seeded calls are reproducible and never reset the shared instance's state.
+    """
+    shared = _get_faker()
+    if rng is random or rng is shared.random:
+        return shared
+    faker = _new_faker()
+    faker.seed_instance(rng.getrandbits(64))
+    return faker
+
+def generate_profiles_namedtuple(
+    n: int,
+    fast: bool = False,
+    seed: Optional[int] = None,
+    workers: Optional[int] = None,
+    rng: Optional[random.Random] = None
+) -> tuple:
     """
     Generates `n` profiles using namedtuple.
 
     Args:
         n (int): Number of profiles to generate.
+        fast (bool): If True, draw only the needed fields in bulk instead of calling `fake.profile()` per row.
+        seed (Optional[int]): Seed for the draws, or the master seed when `workers` is given. The same seed
+            gives identical profiles on the same day (ages are relative to today).
+        workers (Optional[int]): If given, generate in fixed-size shards across this many processes.
+            The output depends only on `seed`, not on the number of workers.
+        rng (Optional[random.Random]): Random source to draw from instead of a seed.
 
     Returns:
         tuple: A tuple containing `n` Profile namedtuples.
+
+    Raises:
+        ValueError: If both seed and rng are given.
     """
+    rng = _profile_rng(seed, rng)
+    if workers is not None:
+        return tuple(_generate_profiles_sharded(n, workers, fast, _master_seed(seed, rng)))
+    if fast:
+        return tuple(map(Profile._make, zip(*_draw_profile_columns(n, rng))))
     profiles = []
     append = profiles.append
+    fake = _seeded_faker(rng)
     for _ in range(n):
         profile = fake.profile()
         birthdate = profile['birthdate']
@@ -41,26 +374,427 @@ def generate_profiles_namedtuple(n: int) -> tuple:
         ))
     return tuple(profiles)
 
+def generate_profiles_table(
+    n: int,
+    fast: bool = False,
+    seed: Optional[int] = None,
+    workers: Optional[int] = None,
+    rng: Optional[random.Random] = None
+) -> ProfileTable:
+    """
+    Generates `n` profiles straight into a columnar ProfileTable.
+
+    Args:
+        n (int): Number of profiles to generate.
+        fast (bool): If True, draw only the needed fields in bulk instead of calling `fake.profile()` per row.
+        seed (Optional[int]): Seed for the draws, or the master seed when `workers` is given.
+        workers (Optional[int]): If given, generate in fixed-size shards across this many processes.
+        rng (Optional[random.Random]): Random source to draw from instead of a seed.
+
+    Returns:
+        ProfileTable: A table containing `n` profiles.
+
+    Raises:
+        ValueError: If both seed and rng are given.
+    """
+    rng = _profile_rng(seed, rng)
+    if workers is not None:
+        return _generate_profiles_sharded(n, workers, fast, _master_seed(seed, rng))
+    table = ProfileTable()
+    if fast:
+        blood_types, latitudes, longitudes, ages = _draw_profile_columns(n, rng)
+        codes = {blood_type: code for code, blood_type in enumerate(table.blood_types)}
+        table.blood_codes = array('B', map(codes.__getitem__, blood_types))
+        table.latitudes = array('d', latitudes)
+        table.longitudes = array('d', longitudes)
+        table.ages = array('H', ages)
+        return table
+    _append_faker_profiles(table, n, _seeded_faker(rng))
+    return table
+
+def _append_faker_profiles(table: ProfileTable, n: int, faker: 'Faker') -> None:
+    """Appends `n` profiles drawn with `faker.profile()` to `table`."""
+    append = table.append
+    for _ in range(n):
+        profile = faker.profile()
+        birthdate = profile['birthdate']
+        append(
+            profile['blood_group'],
+            profile['current_location'][0],
+            profile['current_location'][1],
+            date.today().year - birthdate.year
+        )
+
+# Rows per shard for parallel generation. Shards are seeded by index, so the output is the same for any worker count.
+_SHARD_SIZE = 10000
+
+@lru_cache(maxsize=1)
+def _shard_faker() -> 'Faker':
+    """
+    Returns the Faker instance a worker process reuses across shards.
+
+    It is separate from the shared instance because seeding it per shard would detach the shared
+    instance from `Faker.seed()`.
+    """
+    return _new_faker()
+
+def _shard_seeds(seed: int, count: int) -> List[int]:
+    """Derives one independent seed per shard index from the master seed."""
+    return [random.Random(f"{seed}/{index}").getrandbits(64) for index in range(count)]
+
+def _master_seed(seed: Optional[int], rng: random.Random) -> int:
+    """Returns the master seed for sharded generation: `seed` itself, or one drawn from `rng`."""
+    return seed if seed is not None else rng.getrandbits(64)
+
+def _generate_profile_shard(size: int, seed: int, fast: bool, reuse_faker: bool = True) -> ProfileTable:
+    """
+    Generates one shard of profiles as a ProfileTable.
+
+    The table is what gets sent back to the parent process: its columns pickle as raw array buffers
+    rather than one object per row. With `reuse_faker=False` the shard gets its own Faker instance, which
+    is needed when shards may run in several threads at once.
+    """
+    if fast:
+        return generate_profiles_table(size, fast=True, seed=seed)
+    faker = _shard_faker() if reuse_faker else _new_faker()
+    faker.seed_instance(seed)
+    table = ProfileTable()
+    _append_faker_profiles(table, size, faker)
+    return table
+
+def _generate_profiles_sharded(n: int, workers: int, fast: bool, seed: Optional[int]) -> ProfileTable:
+    """
+    Generates `n` profiles in fixed-size shards, optionally across a process pool.
+
+    Args:
+        n (int): Number of profiles to generate.
+        workers (int): Number of worker processes. With 1 the shards run in the calling process.
+        fast (bool): Whether shards use the fast bulk draws.
+        seed (Optional[int]): Master seed. A random one is picked if None.
+
+    Returns:
+        ProfileTable: The shards concatenated in order.
+
+    Raises:
+        ValueError: If workers is less than 1.
+    """
+    if workers < 1:
+        raise ValueError("workers must be at least 1")
+    if seed is None:
+        seed = random.SystemRandom().getrandbits(64)
+    sizes = [min(_SHARD_SIZE, n - start) for start in range(0, n, _SHARD_SIZE)]
+    seeds = _shard_seeds(seed, len(sizes))
+    table = ProfileTable()
+    if workers == 1 or len(sizes) < 2:
+        shards = map(_generate_profile_shard, sizes, seeds, repeat(fast))
+        for shard in shards:
+            table.extend(shard)
+        return table
+    # Imported here: the process pool machinery is only needed for parallel runs and is slow to import
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for shard in executor.map(_generate_profile_shard, sizes, seeds, repeat(fast)):
+            table.extend(shard)
+    return table
+
+def iter_profiles(
+    n: int,
+    chunk_size: int = 10000,
+    fast: bool = False,
+    seed: Optional[int] = None,
+    rng: Optional[random.Random] = None
+):
+    """
+    Yields `n` profiles in chunks instead of materializing them all at once.
+
+    Only one chunk is alive at a time, so together with ProfileAccumulator a population of any size
+    can be summarized in constant memory.
+
+    Args:
+        n (int): Total number of profiles to generate.
+        chunk_size (int): Maximum number of profiles per chunk. Default is 10000.
+        fast (bool): If True, draw only the needed fields in bulk instead of calling `fake.profile()` per row.
+        seed (Optional[int]): Seed for the draws. The same seed and chunk size give identical chunks.
+        rng (Optional[random.Random]): Random source to draw from instead of a seed.
+
+    Yields:
+        tuple: Tuples of at most `chunk_size` Profile namedtuples.
+
+    Raises:
+        ValueError: If chunk_size is not positive or both seed and rng are given.
+    """
+    if chunk_size <= 0:
+        raise ValueError("chunk_size must be positive")
+    rng = _profile_rng(seed, rng)
+    for start in range(0, n, chunk_size):
+        size = min(chunk_size, n - start)
+        if fast:
+            yield tuple(map(Profile._make, zip(*_draw_profile_columns(size, rng))))
+        else:
+            yield generate_profiles_namedtuple(size, rng=rng)
+
+class FunctionStats:
+    """
+    Running latency statistics for one instrumented function.
+
+    Count, total, min and max are exact. Percentiles come from a bounded reservoir sample of the
+    latencies, so memory stays constant however often the function is called.
+    """
+    __slots__ = ('calls', 'total', 'minimum', 'maximum', 'samples', 'allocated', '_max_samples', '_rng')
+
+    def __init__(self, max_samples: int = 1024):
+        self.calls = 0
+        self.total = 0.0
+        self.minimum = float('inf')
+        self.maximum = 0.0
+        self.samples = []
+        self.allocated = None
+        self._max_samples = max_samples
+        self._rng = random.Random(0)
+
+    def record(self, elapsed: float, allocated: Optional[int] = None) -> None:
+        """Adds one call that took `elapsed` seconds and optionally allocated `allocated` bytes at peak."""
+        self.calls += 1
+        self.total += elapsed
+        if elapsed < self.minimum:
+            self.minimum = elapsed
+        if elapsed > self.maximum:
+            self.maximum = elapsed
+        if len(self.samples) < self._max_samples:
+            self.samples.append(elapsed)
+        else:
+            slot = self._rng.randrange(self.calls)
+            if slot < self._max_samples:
+                self.samples[slot] = elapsed
+        if allocated is not None:
+            self.allocated = (self.allocated or 0) + allocated
+
+    def percentile(self, fraction: float) -> float:
+        """Returns the latency below which `fraction` of the sampled calls fall (nearest rank)."""
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    def as_dict(self) -> Dict[str, Optional[float]]:
+        """Returns the statistics as a plain dictionary."""
+        return {
+            'calls': self.calls,
+            'total': self.total,
+            'min': self.minimum if self.calls else 0.0,
+            'max': self.maximum,
+            'mean': self.total / self.calls if self.calls else 0.0,
+            'p50': self.percentile(0.5),
+            'p99': self.percentile(0.99),
+            'allocated_bytes': self.allocated,
+        }
+
+class MetricsRegistry:
+    """
+    Collects per-function call statistics from `timing_decorator`.
+
+    Recording can be switched off with the SESSION8_METRICS environment variable (0, false or off) or
+    temporarily with `disabled()`; while off, instrumented functions are called directly. Allocation
+    tracking is opt-in and only records while `tracemalloc` is tracing.
+
+    Attributes:
+        enabled (bool): Whether calls are recorded.
+        verbose (bool): Whether each call's time is printed, as the decorator used to do. Set from
+            the SESSION8_TIMING_VERBOSE environment variable.
+        track_allocations (bool): Whether to record the peak traced memory of each call.
+    """
+
+    def __init__(self, enabled: bool = True, verbose: bool = False, track_allocations: bool = False):
+        self.enabled = enabled
+        self.verbose = verbose
+        self.track_allocations = track_allocations
+        self.functions = {}
+
+    def record(self, name: str, elapsed: float, allocated: Optional[int] = None) -> None:
+        """Records one call of the function `name`."""
+        stats = self.functions.get(name)
+        if stats is None:
+            stats = self.functions[name] = FunctionStats()
+        stats.record(elapsed, allocated)
+
+    def stats(self, name: str) -> Optional[Dict[str, Optional[float]]]:
+        """Returns the statistics recorded for `name`, or None if it was never called."""
+        stats = self.functions.get(name)
+        return None if stats is None else stats.as_dict()
+
+    def reset(self) -> None:
+        """Forgets all recorded calls."""
+        self.functions.clear()
+
+    @contextmanager
+    def disabled(self):
+        """Context manager that stops recording for the duration of the block."""
+        previous = self.enabled
+        self.enabled = False
+        try:
+            yield self
+        finally:
+            self.enabled = previous
+
+    def to_json(self) -> str:
+        """Exports all statistics as a JSON object keyed by function name."""
+        return json.dumps({name: stats.as_dict() for name, stats in sorted(self.functions.items())}, indent=2)
+
+    def to_prometheus(self) -> str:
+        """Exports all statistics in the Prometheus text exposition format."""
+        lines = [
+            '# HELP session8_function_seconds Execution time of instrumented session8 functions.',
+            '# TYPE session8_function_seconds summary',
+        ]
+        for name, stats in sorted(self.functions.items()):
+            for quantile in (0.5, 0.99):
+                lines.append(
+                    f'session8_function_seconds{{function="{name}",quantile="{quantile}"}} {stats.percentile(quantile)!r}'
+                )
+            lines.append(f'session8_function_seconds_sum{{function="{name}"}} {stats.total!r}')
+            lines.append(f'session8_function_seconds_count{{function="{name}"}} {stats.calls}')
+        allocating = [(name, stats) for name, stats in sorted(self.functions.items()) if stats.allocated is not None]
+        if allocating:
+            lines.append('# HELP session8_function_allocated_bytes_total Peak traced bytes summed over calls.')
+            lines.append('# TYPE session8_function_allocated_bytes_total counter')
+            for name, stats in allocating:
+                lines.append(f'session8_function_allocated_bytes_total{{function="{name}"}} {stats.allocated}')
+        return '\n'.join(lines) + '\n'
+
+def _env_flag(name: str, default: bool) -> bool:
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() not in ('0', 'false', 'off', 'no', '')
+
+# Registry that every function decorated with timing_decorator reports to
+metrics = MetricsRegistry(
+    enabled=_env_flag('SESSION8_METRICS', True),
+    verbose=_env_flag('SESSION8_TIMING_VERBOSE', False)
+)
+
 # Writing a timing decorator to time the function runtimes
 def timing_decorator(func):
-    """Decorator to measure execution time of a function."""
+    """Decorator to measure execution time of a function and record it in the `metrics` registry."""
+    name = func.__name__
+
     @wraps(func)
     def wrapper(*args, **kwargs):
+        if not metrics.enabled:
+            return func(*args, **kwargs)
+        tracking = metrics.track_allocations and tracemalloc.is_tracing()
+        if tracking:
+            baseline = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
         start = perf_counter()
         result = func(*args, **kwargs)
         end = perf_counter()
-        print(f"Function {func.__name__} Execution Time: {end - start:.6f} seconds")
+        allocated = tracemalloc.get_traced_memory()[1] - baseline if tracking else None
+        metrics.record(name, end - start, allocated)
+        if metrics.verbose:
+            print(f"Function {name} Execution Time: {end - start:.6f} seconds")
         return result
     return wrapper
 
+# Map-reduce helpers for running the metrics across a process pool. The columns are copied once into a
+# shared memory block; each worker attaches to it and reduces its own row range to a small partial.
+
+def _blood_type_partial(columns: Dict[str, memoryview], start: int, stop: int) -> Dict[int, int]:
+    raw = bytes(columns['blood_codes'][start:stop])
+    return {code: raw.count(code.to_bytes(1, 'little')) for code in set(raw)}
+
+def _location_partial(columns: Dict[str, memoryview], start: int, stop: int) -> Tuple[float, float, int]:
+    return sum(columns['latitudes'][start:stop]), sum(columns['longitudes'][start:stop]), stop - start
+
+def _oldest_partial(columns: Dict[str, memoryview], start: int, stop: int) -> Optional[int]:
+    return max(columns['ages'][start:stop], default=None)
+
+def _age_sum_partial(columns: Dict[str, memoryview], start: int, stop: int) -> Tuple[int, int]:
+    return sum(columns['ages'][start:stop]), stop - start
+
+def _shared_columns_partial(name: str, layout: Dict[str, Tuple[int, str, int]], kernel, start: int, stop: int):
+    """
+    Worker entry point: attaches to the shared memory block, applies `kernel` to rows [start, stop) and detaches.
+    """
+    from multiprocessing import shared_memory
+    block = shared_memory.SharedMemory(name=name)
+    columns = {
+        column: block.buf[offset:offset + length * struct.calcsize(typecode)].cast(typecode)
+        for column, (offset, typecode, length) in layout.items()
+    }
+    try:
+        return kernel(columns, start, stop)
+    finally:
+        for view in columns.values():
+            view.release()
+        block.close()
+
+def _map_columns(columns: Dict[str, array], kernel, workers: int) -> list:
+    """
+    Splits the rows of `columns` into `workers` ranges and returns the partial result of `kernel` for each.
+
+    With one worker the kernel runs in-process on the arrays directly. Otherwise the columns are packed
+    into a shared memory block so the workers read them without any rows being pickled.
+
+    Raises:
+        ValueError: If workers is less than 1.
+    """
+    if workers < 1:
+        raise ValueError("workers must be at least 1")
+    count = len(next(iter(columns.values())))
+    bounds = [count * index // workers for index in range(workers + 1)]
+    ranges = [(start, stop) for start, stop in zip(bounds, bounds[1:]) if stop > start]
+    if workers == 1 or len(ranges) < 2:
+        views = {column: memoryview(values) for column, values in columns.items()}
+        return [kernel(views, start, stop) for start, stop in ranges]
+
+    views = {column: memoryview(values) for column, values in columns.items()}
+    layout = {}
+    size = 0
+    for column, view in views.items():
+        size += -size % 8
+        layout[column] = (size, view.format, len(view))
+        size += view.nbytes
+    # Deferred like in _generate_profiles_sharded
+    from concurrent.futures import ProcessPoolExecutor
+    from multiprocessing import shared_memory
+    block = shared_memory.SharedMemory(create=True, size=max(size, 1))
+    try:
+        for column, view in views.items():
+            offset = layout[column][0]
+            block.buf[offset:offset + view.nbytes] = view.cast('B')
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(_shared_columns_partial, block.name, layout, kernel, start, stop)
+                for start, stop in ranges
+            ]
+            return [future.result() for future in futures]
+    finally:
+        block.close()
+        block.unlink()
+
+def _as_table(profiles) -> ProfileTable:
+    return profiles if isinstance(profiles, ProfileTable) else ProfileTable.from_profiles(profiles)
+
+def _age_column(ages) -> array:
+    if isinstance(ages, ProfileTable):
+        return ages.ages
+    if isinstance(ages, ProfileIndex):
+        return array('q', map(attrgetter('age'), ages))
+    if isinstance(ages, AgeHistogram):
+        return array('q', ages.elements())
+    return ages if isinstance(ages, (array, memoryview)) else array('q', ages)
+
 # Defining functions as per assignment
 @timing_decorator
-def largest_blood_type_namedtuple(profiles: Tuple) -> Optional[str]:
+def largest_blood_type_namedtuple(profiles: Tuple, workers: Optional[int] = None) -> Optional[str]:
     """
     Returns the blood type with the highest frequency.
 
     Args:
-        profiles (Tuple): A tuple of Profile namedtuples.
+        profiles (Tuple): A tuple of Profile namedtuples, a ProfileTable or a ProfileIndex.
+        workers (Optional[int]): If given, count blood types in parallel across this many processes.
+            Passing a ProfileTable avoids converting the rows to columns first.
 
     Returns:
         Optional[str]: The blood type with the highest frequency. If multiple blood types have the same frequency, one of them is returned.
@@ -68,69 +802,285 @@ def largest_blood_type_namedtuple(profiles: Tuple) -> Optional[str]:
     """
     if not profiles:
         return None
+    if workers is not None:
+        table = _as_table(profiles)
+        code_counts = Counter()
+        for partial in _map_columns({'blood_codes': table.blood_codes}, _blood_type_partial, workers):
+            code_counts.update(partial)
+        return table.blood_types[max(code_counts, key=code_counts.get)]
+    if isinstance(profiles, ProfileTable):
+        blood_type_counts = profiles.blood_type_counts()
+        return max(blood_type_counts, key=blood_type_counts.get)
+    if isinstance(profiles, ProfileIndex):
+        return profiles.largest_blood_type()
     blood_type_counts = Counter(profile.blood_type for profile in profiles)
     return blood_type_counts.most_common(1)[0][0]
 
 @timing_decorator
-def mean_current_location_namedtuple(profiles: Tuple) -> Tuple[float, float]:
+def mean_current_location_namedtuple(profiles: Tuple, workers: Optional[int] = None) -> Tuple[float, float]:
     """
     Returns the mean latitude and longitude from a list of namedtuple profiles.
 
     Args:
-        profiles (Tuple): A tuple of Profile namedtuples.
+        profiles (Tuple): A tuple of Profile namedtuples, a ProfileTable or a ProfileIndex.
+        workers (Optional[int]): If given, sum the coordinates in parallel across this many processes.
 
     Returns:
         Tuple[float, float]: A tuple containing the mean latitude and mean longitude as floats.
     """
-    total_lat = sum(profile.latitude for profile in profiles)
-    total_long = sum(profile.longitude for profile in profiles)
+    if workers is not None:
+        table = _as_table(profiles)
+        columns = {'latitudes': table.latitudes, 'longitudes': table.longitudes}
+        partials = _map_columns(columns, _location_partial, workers)
+        count = sum(partial[2] for partial in partials)
+        return (
+            float(sum(partial[0] for partial in partials) / count),
+            float(sum(partial[1] for partial in partials) / count)
+        )
+    if isinstance(profiles, ProfileTable):
+        count = len(profiles)
+        return (float(sum(profiles.latitudes) / count), float(sum(profiles.longitudes) / count))
+    if isinstance(profiles, ProfileIndex):
+        return profiles.mean_current_location()
+    total_lat = sum(map(attrgetter('latitude'), profiles))
+    total_long = sum(map(attrgetter('longitude'), profiles))
     count = len(profiles)
     return (float(total_lat / count), float(total_long / count))
 
 @timing_decorator
-def oldest_person_age_namedtuple(ages: Tuple[int, ...]) -> int:
+def oldest_person_age_namedtuple(ages: Tuple[int, ...], workers: Optional[int] = None) -> int:
     """
     Returns the age of the oldest person.
 
     Args:
-        ages (Tuple[int, ...]): A tuple of integers representing ages.
+        ages (Tuple[int, ...]): A tuple of integers representing ages, an `age_view(...)` or AgeHistogram of
+            the profiles, a ProfileTable or a ProfileIndex.
+        workers (Optional[int]): If given, find the maximum in parallel across this many processes.
 
     Returns:
         int: The age of the oldest person.
     """
+    if workers is not None:
+        partials = _map_columns({'ages': _age_column(ages)}, _oldest_partial, workers)
+        return int(max(partial for partial in partials if partial is not None))
+    if isinstance(ages, ProfileTable):
+        ages = ages.ages
+    elif isinstance(ages, ProfileIndex):
+        return int(max(map(attrgetter('age'), ages)))
+    # An AgeHistogram iterates over its distinct ages, so max() reads it directly
     return int(max(ages))
 
 @timing_decorator
-def average_age_namedtuple(ages: Tuple[int, ...]) -> float:
+def average_age_namedtuple(ages: Tuple[int, ...], workers: Optional[int] = None) -> float:
     """
     Returns the average age from a list of namedtuple profiles.
 
     Args:
-        ages (Tuple[int, ...]): A tuple of integers representing ages.
+        ages (Tuple[int, ...]): A tuple of integers representing ages, an `age_view(...)` or AgeHistogram of
+            the profiles, a ProfileTable or a ProfileIndex.
+        workers (Optional[int]): If given, sum the ages in parallel across this many processes.
 
     Returns:
         float: The average of age.
     """
+    if workers is not None:
+        partials = _map_columns({'ages': _age_column(ages)}, _age_sum_partial, workers)
+        return round(sum(partial[0] for partial in partials) / sum(partial[1] for partial in partials), 2)
+    if isinstance(ages, ProfileTable):
+        ages = ages.ages
+    elif isinstance(ages, ProfileIndex):
+        return ages.average_age()
+    elif isinstance(ages, AgeHistogram):
+        return round(sum(map(mul, ages.keys(), ages.values())) / ages.total(), 2)
     return round(sum(ages) / len(ages), 2)
 
+class AgeView:
+    """
+    Read-only projection of the `age` attribute of a sequence of profiles.
+
+    Ages are read from the profiles on access, so passing an AgeView to the age metrics costs no memory
+    beyond the profiles themselves, where `tuple(profile.age for profile in profiles)` would copy the column.
+    """
+    __slots__ = ('profiles',)
+
+    def __init__(self, profiles):
+        self.profiles = profiles
+
+    def __len__(self) -> int:
+        return len(self.profiles)
+
+    def __iter__(self):
+        return map(attrgetter('age'), self.profiles)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return AgeView(self.profiles[index])
+        return self.profiles[index].age
+
+def age_view(profiles):
+    """
+    Returns the ages of `profiles` for the age metrics without copying them.
+
+    Args:
+        profiles: A ProfileTable, an age column (`array` or `memoryview`), or a sequence of Profile
+            namedtuples or other rows with an `age` attribute.
+
+    Returns:
+        The table's own `array('H')` age column, the column itself, or an AgeView over the rows.
+
+    Example:
+        >>> ages = age_view(profiles)
+        >>> oldest_person_age_namedtuple(ages), average_age_namedtuple(ages)
+    """
+    if isinstance(profiles, ProfileTable):
+        return profiles.ages
+    if isinstance(profiles, (array, memoryview, AgeView)):
+        return profiles
+    return AgeView(profiles)
+
+class AgeHistogram(Counter):
+    """
+    Number of profiles of each age, built in one pass over the rows.
+
+    Ages are small integers, so the histogram holds at most a few hundred entries however many profiles it
+    counts. Both age metrics accept it, which lets them share a single pass over namedtuple rows without
+    copying the age column.
+    """
+
+    @classmethod
+    def from_profiles(cls, profiles) -> 'AgeHistogram':
+        """
+        Counts the ages of `profiles`.
+
+        Args:
+            profiles: A ProfileTable, an age column, or a sequence of Profile namedtuples or other rows with
+                an `age` attribute.
+        """
+        return cls(age_view(profiles))
+
+# Marks an exhausted iterator in `_reservoir_sample`
+_END_OF_SAMPLE = object()
+
+def _reservoir_sample(values, size: int, rng: random.Random) -> list:
+    """
+    Returns a uniform random sample of at most `size` items from the iterable `values` in one pass.
+
+    Uses Algorithm L, which draws the number of items to skip before the next replacement instead of a
+    random number per item, so the cost after the first `size` items grows only logarithmically.
+    """
+    values = iter(values)
+    sample = list(islice(values, size))
+    if len(sample) < size:
+        return sample
+    log, exp = math.log, math.exp
+
+    def random_value() -> float:
+        # In (0, 1], so its logarithm is always defined
+        return 1.0 - rng.random()
+
+    weight = exp(log(random_value()) / size)
+    while True:
+        skip = int(log(random_value()) / log(1.0 - weight)) if weight < 1.0 else 0
+        item = next(islice(values, skip, None), _END_OF_SAMPLE)
+        if item is _END_OF_SAMPLE:
+            return sample
+        sample[rng.randrange(size)] = item
+        weight *= exp(log(random_value()) / size)
+
+@timing_decorator
+def age_quantiles(
+    ages,
+    quantiles: Tuple[float, ...] = (0.5, 0.9, 0.99),
+    approximate: bool = False,
+    sample_size: int = 10000,
+    seed: Optional[int] = None
+) -> Dict[float, Optional[int]]:
+    """
+    Returns age quantiles (by default p50, p90 and p99) in a single pass over the ages.
+
+    The exact mode builds a histogram of the ages, which stays small because ages are bounded integers.
+    The approximate mode keeps a reservoir sample of `sample_size` ages instead, so memory is bounded for
+    any kind of value. Both use the nearest-rank rule of the latency percentiles: the quantile q is the
+    value at position `int(q * count)` of the sorted ages.
+
+    Args:
+        ages: Ages as a tuple, array or memoryview, an `age_view(...)`, an AgeHistogram, a ProfileTable,
+            or any iterable of ages, such as a generator over streamed chunks.
+        quantiles (Tuple[float, ...]): The quantiles to compute, each between 0 and 1.
+        approximate (bool): If True, estimate the quantiles from a reservoir sample.
+        sample_size (int): Reservoir size for the approximate mode. Default is 10000.
+        seed (Optional[int]): Seed for the reservoir sample.
+
+    Returns:
+        Dict[float, Optional[int]]: Each quantile mapped to its age, or to None if there are no ages.
+
+    Raises:
+        ValueError: If a quantile is outside [0, 1] or sample_size is not positive.
+    """
+    if any(not 0 <= quantile <= 1 for quantile in quantiles):
+        raise ValueError("quantiles must be between 0 and 1")
+    if sample_size < 1:
+        raise ValueError("sample_size must be positive")
+    if isinstance(ages, ProfileTable):
+        ages = ages.ages
+    elif isinstance(ages, AgeHistogram) and approximate:
+        ages = ages.elements()
+    if approximate:
+        ages = _reservoir_sample(ages, sample_size, random.Random(seed))
+    counts = ages if isinstance(ages, AgeHistogram) else Counter(ages)
+    histogram = sorted(counts.items())
+    count = sum(map(itemgetter(1), histogram))
+    if not count:
+        return dict.fromkeys(quantiles)
+    values = [age for age, _ in histogram]
+    cumulative = list(accumulate(map(itemgetter(1), histogram)))
+    return {
+        quantile: values[bisect_right(cumulative, min(count - 1, int(quantile * count)))]
+        for quantile in quantiles
+    }
+
 """
 --------------------------------------------------------------------------------------------------------------
 2. Do the same thing above using a dictionary. Prove that namedtuple is faster. - 250 (including 5 test cases)
 --------------------------------------------------------------------------------------------------------------
 """
 
-def generate_profiles_dict(n: int) -> List[Dict]:
+def generate_profiles_dict(
+    n: int,
+    fast: bool = False,
+    seed: Optional[int] = None,
+    workers: Optional[int] = None,
+    rng: Optional[random.Random] = None
+) -> List[Dict]:
     """
     Generates `n` profiles using dictionaries.
 
     Args:
         n (int): Number of profiles to generate.
+        fast (bool): If True, draw only the needed fields in bulk instead of calling `fake.profile()` per row.
+        seed (Optional[int]): Seed for the draws, or the master seed when `workers` is given.
+        workers (Optional[int]): If given, generate in fixed-size shards across this many processes.
+            The output depends only on `seed`, not on the number of workers.
+        rng (Optional[random.Random]): Random source to draw from instead of a seed.
 
     Returns:
         List[Dict]: A list of dictionaries, each representing a profile with keys 'blood_type', 'latitude', 'longitude', and 'age'.
+
+    Raises:
+        ValueError: If both seed and rng are given.
     """
+    rng = _profile_rng(seed, rng)
+    if workers is not None:
+        sharded = _generate_profiles_sharded(n, workers, fast, _master_seed(seed, rng))
+        return [profile._asdict() for profile in sharded]
+    if fast:
+        return [
+            {'blood_type': blood_type, 'latitude': latitude, 'longitude': longitude, 'age': age}
+            for blood_type, latitude, longitude, age in zip(*_draw_profile_columns(n, rng))
+        ]
     profiles = []
     append = profiles.append
+    fake = _seeded_faker(rng)
     for _ in range(n):
         profile = fake.profile()
         birthdate = profile['birthdate']
@@ -205,133 +1155,2403 @@ def average_age_dict(profiles: List[Dict]) -> float:
     age_sum = sum(profile['age'] for profile in profiles)
     return round(age_sum / len(profiles), 2)
 
-def compare_performance(n: int) -> None:
-    """
-    Compares the performance of metric calculations using namedtuple vs dictionary implementations.
-
-    Args:
-        n (int): The number of profiles to generate and evaluate.
+# Result of a fused pass over a profile collection
+ProfileSummary = namedtuple(
+    'ProfileSummary',
+    'count largest_blood_type mean_current_location oldest_person_age youngest_person_age average_age age_variance'
+)
 
-    Returns:
-        str: A string indicating whether namedtuple or dictionary implementation is faster.
-    """
-    profiles_tuples = generate_profiles_namedtuple(n)
-    ages_tuple = tuple(profile.age for profile in profiles_tuples)
-
-    start = perf_counter()
-    print("Calculating metrics using Named Tuple operations...")
-    largest_blood_type_namedtuple(profiles_tuples)
-    mean_current_location_namedtuple(profiles_tuples)
-    oldest_person_age_namedtuple(ages_tuple)
-    average_age_namedtuple(ages_tuple)
-    end = perf_counter()
-    total_elapsed_named_tuple = end - start
-    print("\nTotal Elapsed time for Named Tuple calculations: {:.4f} seconds\n".format(total_elapsed_named_tuple))
-
-    profiles_dict = generate_profiles_dict(n)
-    start = perf_counter()
-    print("Calculating metrics using Dictionary operations...")
-    largest_blood_type_dict(profiles_dict)
-    mean_current_location_dict(profiles_dict)
-    oldest_person_age_dict(profiles_dict)
-    average_age_dict(profiles_dict)
-    end = perf_counter()
-    total_elapsed_dict = end - start
-    print("Total Elapsed time for Dictionary calculations: {:.4f} seconds\n".format(total_elapsed_dict))
-
-    if total_elapsed_dict > total_elapsed_named_tuple:
-        return f"Namedtuple is {total_elapsed_dict / total_elapsed_named_tuple:.2f} times faster than Dictionary."
-    else:
-        return f"Dictionary is {total_elapsed_named_tuple / total_elapsed_dict:.2f} times faster than Namedtuple."
+class ProfileAccumulator:
+    """
+    Mergeable running state for the profile metrics.
 
-"""
---------------------------------------------------------------------------------------------------------------
-3. Create fake data (you can use Faker for company names) for an imaginary stock exchange for the top 100 companies 
-    (name, symbol, open, high, close). Assign a random weight to all the companies. Stock Market Value would be the sum 
-    of each_stock_value*random number/(sum of random values) or for 100 companies. Calculate and show what value the 
-    stock market started at, what was the highest value during the day, and where did it end. Make sure your open, high,
-    and close are not totally random. You can only use namedtuple. - 500 (including 10 test cases)
---------------------------------------------------------------------------------------------------------------
-"""
+    The accumulator only keeps counts, sums and running extremes, so profiles can be fed in chunks
+    from a stream of any length in constant memory. Accumulators built over separate shards can be
+    combined with `merge`. Coordinates are summed as floats, as in a ProfileTable, so Faker rows with
+    Decimal coordinates and float rows from any other source can be mixed.
+    """
+    __slots__ = (
+        'blood_type_counts', 'count', 'latitude_sum', 'longitude_sum',
+        'age_sum', 'age_square_sum', 'oldest', 'youngest'
+    )
 
-import random
-import re
+    def __init__(self):
+        self.blood_type_counts = {}
+        self.count = 0
+        self.latitude_sum = 0.0
+        self.longitude_sum = 0.0
+        self.age_sum = 0
+        self.age_square_sum = 0
+        self.oldest = None
+        self.youngest = None
 
-# Define the Stock namedtuple
-Stock = namedtuple('Stock', ['name', 'symbol', 'open', 'high', 'low', 'close', 'weight'])
+    def update(self, profiles) -> 'ProfileAccumulator':
+        """
+        Folds a batch of profiles into the running state in a single pass.
 
-fake = Faker()
+        Args:
+            profiles: Profile namedtuples, profile dictionaries, a ProfileTable or any iterator of profiles.
 
-def generate_stock_data(num_stocks: int = 100, start_range: int = 10, end_range: int = 500) -> Tuple[Stock, ...]:
-    """
-    Generates fake stock data for a specified number of stocks.
+        Returns:
+            ProfileAccumulator: The accumulator itself, so calls can be chained.
+        """
+        if isinstance(profiles, ProfileTable):
+            if len(profiles):
+                self._update_extremes(min(profiles.ages), max(profiles.ages))
+                self._update_counts(profiles.blood_type_counts())
+                self.count += len(profiles)
+                self.latitude_sum += sum(profiles.latitudes)
+                self.longitude_sum += sum(profiles.longitudes)
+                self.age_sum += sum(profiles.ages)
+                self.age_square_sum += sum(age * age for age in profiles.ages)
+            return self
 
-    Args:
-        num_stocks (int): The number of stocks to generate. Default is 100.
-        start_range (int): The minimum value for the stock price. Default is 10.
-        end_range (int): The maximum value for the stock price. Default is 500.
+        rows = iter(profiles)
+        first = next(rows, None)
+        if first is None:
+            return self
+        if isinstance(first, dict):
+            fields = itemgetter('blood_type', 'latitude', 'longitude', 'age')
+        else:
+            fields = attrgetter('blood_type', 'latitude', 'longitude', 'age')
 
-    Returns:
-        Tuple[Stock, ...]: A tuple of Stock namedtuples, each containing:
-            - name (str): The name of the company.
-            - symbol (str): The stock ticker symbol.
-            - open (float): The opening price of the stock.
-            - high (float): The highest price of the stock during the day.
-            - low (float): The lowest price of the stock during the day.
-            - close (float): The closing price of the stock.
-            - weight (float): The weight of the stock in a portfolio, normalized to sum to 1.
+        blood_type_counts = {}
+        get = blood_type_counts.get
+        count = 0
+        latitude_sum = 0.0
+        longitude_sum = 0.0
+        age_sum = 0
+        age_square_sum = 0
+        oldest = youngest = fields(first)[3]
+        for blood_type, latitude, longitude, age in map(fields, chain((first,), rows)):
+            blood_type_counts[blood_type] = get(blood_type, 0) + 1
+            count += 1
+            latitude_sum += float(latitude)
+            longitude_sum += float(longitude)
+            age_sum += age
+            age_square_sum += age * age
+            if age > oldest:
+                oldest = age
+            elif age < youngest:
+                youngest = age
 
-    Raises:
-        ValueError: If the start_range is not less than the end_range.
-    """
-    if start_range >= end_range:
-        raise ValueError("start_range must be less than end_range")
+        self._update_extremes(youngest, oldest)
+        self._update_counts(blood_type_counts)
+        self.count += count
+        self.latitude_sum += latitude_sum
+        self.longitude_sum += longitude_sum
+        self.age_sum += age_sum
+        self.age_square_sum += age_square_sum
+        return self
 
-    stocks = []
-    total_weight = 0.0
-    weights = []
-    used_symbols = set()
+    def merge(self, other: 'ProfileAccumulator') -> 'ProfileAccumulator':
+        """Folds the state of another accumulator into this one and returns this accumulator."""
+        if other.count:
+            self._update_extremes(other.youngest, other.oldest)
+            self._update_counts(other.blood_type_counts)
+            self.count += other.count
+            self.latitude_sum += other.latitude_sum
+            self.longitude_sum += other.longitude_sum
+            self.age_sum += other.age_sum
+            self.age_square_sum += other.age_square_sum
+        return self
 
-    while len(stocks) < num_stocks:
-        name = fake.company()
-        x = ''.join(set(re.sub(r'[^a-zA-Z]', '', name.upper())))
+    def _update_counts(self, blood_type_counts: Dict[str, int]) -> None:
+        counts = self.blood_type_counts
+        for blood_type, count in blood_type_counts.items():
+            counts[blood_type] = counts.get(blood_type, 0) + count
 
-        for _ in range(20):
-            symbol = ''.join(random.choices(x, k=3))
-            if symbol not in used_symbols:
-                used_symbols.add(symbol)
-                break
-        else:
-            continue  # Retry with a new company name if no unique symbol was found
+    def _update_extremes(self, youngest: int, oldest: int) -> None:
+        if self.oldest is None or oldest > self.oldest:
+            self.oldest = oldest
+        if self.youngest is None or youngest < self.youngest:
+            self.youngest = youngest
 
-        open_price = round(random.uniform(start_range, end_range), 4)
-        high_price = round(random.uniform(1.001, 1.15) * open_price, 4)
-        low_price = round(random.uniform(0.85, 1) * open_price, 4)
-        close_price = round(random.uniform(low_price, high_price), 4)
+    def largest_blood_type(self) -> Optional[str]:
+        """Returns the most frequent blood type seen so far, or None if no profiles were seen."""
+        if not self.blood_type_counts:
+            return None
+        return max(self.blood_type_counts, key=self.blood_type_counts.get)
 
-        weight = round(random.random(), 4)
-        weights.append(weight)
-        total_weight += weight
+    def mean_current_location(self) -> Optional[Tuple[float, float]]:
+        """Returns the mean (latitude, longitude) seen so far, or None if no profiles were seen."""
+        if not self.count:
+            return None
+        return (float(self.latitude_sum / self.count), float(self.longitude_sum / self.count))
 
-        stock = Stock(name, symbol, open_price, high_price, low_price, close_price, weight)
-        stocks.append(stock)
+    def oldest_person_age(self) -> Optional[int]:
+        """Returns the oldest age seen so far, or None if no profiles were seen."""
+        return None if self.oldest is None else int(self.oldest)
 
-    # Normalize weights so they sum to 1
-    normalized_stocks = tuple(stock._replace(weight=round(stock.weight / total_weight, 4)) for stock in stocks)
+    def average_age(self) -> Optional[float]:
+        """Returns the average age seen so far rounded to two decimals, or None if no profiles were seen."""
+        if not self.count:
+            return None
+        return round(self.age_sum / self.count, 2)
 
-    return tuple(normalized_stocks)
+    def summary(self) -> ProfileSummary:
+        """Returns all metrics for the profiles seen so far as a ProfileSummary."""
+        if not self.count:
+            return ProfileSummary(0, None, None, None, None, None, None)
+        count = self.count
+        return ProfileSummary(
+            count,
+            self.largest_blood_type(),
+            self.mean_current_location(),
+            self.oldest_person_age(),
+            int(self.youngest),
+            self.average_age(),
+            (count * self.age_square_sum - self.age_sum * self.age_sum) / (count * count)
+        )
 
-def calculate_market_values(stocks: Tuple[Stock, ...]) -> Tuple[float, float, float]:
+@timing_decorator
+def compute_profile_summary(profiles) -> ProfileSummary:
     """
-    Calculate the weighted market values for open, high, and close prices.
+    Computes every profile metric in a single pass over the data.
+
+    Instead of scanning the profiles once per metric, blood type counts, location sums and age
+    statistics are accumulated together, so each row is read exactly once.
 
     Args:
-        stocks (Tuple[Stock, ...]): A tuple of Stock namedtuples, each containing the open, high, close prices, and a weight.
+        profiles: Profile namedtuples, profile dictionaries or a ProfileTable. Any iterable is accepted,
+            including generators.
 
     Returns:
-        Tuple[float, float, float]: The weighted market open, high, and close values, rounded to two decimal places.
+        ProfileSummary: The number of profiles, the most common blood type, the mean (latitude, longitude),
+        the oldest and youngest age, the average age rounded to two decimals and the population variance
+        of the ages. All fields except `count` are None when there are no profiles.
     """
-    market_open = sum(stock.open * stock.weight for stock in stocks)
-    market_high = sum(stock.high * stock.weight for stock in stocks)
-    market_close = sum(stock.close * stock.weight for stock in stocks)
-    return round(market_open, 4), round(market_high, 4), round(market_close, 4)
+    return ProfileAccumulator().update(profiles).summary()
+
+# Aggregates of one blood type group in a ProfileIndex: row count, mean (latitude, longitude) and average age
+BloodGroupStats = namedtuple('BloodGroupStats', 'count mean_current_location average_age')
+
+class _BloodGroup:
+    """Row ids and running sums of one blood type in a ProfileIndex."""
+    __slots__ = ('rows', 'latitude_sum', 'longitude_sum', 'age_sum')
+
+    def __init__(self):
+        self.rows = {}
+        self.latitude_sum = 0.0
+        self.longitude_sum = 0.0
+        self.age_sum = 0
+
+    def stats(self) -> BloodGroupStats:
+        count = len(self.rows)
+        return BloodGroupStats(
+            count,
+            (float(self.latitude_sum / count), float(self.longitude_sum / count)),
+            round(self.age_sum / count, 2)
+        )
+
+class ProfileIndex:
+    """
+    Profiles indexed by blood type, with per-group counts and sums kept up to date.
+
+    The index maps each blood type to the ids of its rows and maintains the row count and the latitude,
+    longitude and age sums of every group as profiles are appended and removed. The most common blood type
+    and the overall or per-group mean location and average age are then answered in O(number of blood
+    types) without reading the rows again. Coordinates are summed as floats, so Faker rows with Decimal
+    coordinates and float rows from any other source can be mixed. The namedtuple metric functions accept
+    a ProfileIndex.
+
+    Row ids are assigned in insertion order and are never reused, so they stay valid after removals.
+    """
+    __slots__ = ('_rows', '_groups', '_next_id')
+
+    def __init__(self, profiles=()):
+        """
+        Builds the index over `profiles`.
+
+        Args:
+            profiles: Profile namedtuples, profile dictionaries or a ProfileTable.
+        """
+        self._rows = {}
+        self._groups = {}
+        self._next_id = 0
+        self.extend(profiles)
+
+    def append(self, profile) -> int:
+        """
+        Adds one Profile namedtuple or profile dictionary to the index in O(1).
+
+        Returns:
+            int: The row id of the new profile.
+        """
+        if isinstance(profile, dict):
+            profile = Profile(profile['blood_type'], profile['latitude'], profile['longitude'], profile['age'])
+        group = self._groups.get(profile.blood_type) or _BloodGroup()
+        # Sums are computed before the index is touched, so a bad row leaves it unchanged
+        latitude_sum = group.latitude_sum + float(profile.latitude)
+        longitude_sum = group.longitude_sum + float(profile.longitude)
+        age_sum = group.age_sum + profile.age
+        row_id = self._next_id
+        self._next_id += 1
+        self._rows[row_id] = profile
+        self._groups[profile.blood_type] = group
+        group.rows[row_id] = None
+        group.latitude_sum = latitude_sum
+        group.longitude_sum = longitude_sum
+        group.age_sum = age_sum
+        return row_id
+
+    def extend(self, profiles) -> range:
+        """Adds every profile of `profiles` and returns the range of their row ids."""
+        start = self._next_id
+        for profile in profiles:
+            self.append(profile)
+        return range(start, self._next_id)
+
+    def remove(self, row_id: int) -> Profile:
+        """
+        Removes one row from the index in O(1).
+
+        Returns:
+            Profile: The removed profile.
+
+        Raises:
+            KeyError: If there is no row with this id.
+        """
+        profile = self._rows.pop(row_id)
+        group = self._groups[profile.blood_type]
+        del group.rows[row_id]
+        if not group.rows:
+            del self._groups[profile.blood_type]
+            return profile
+        group.latitude_sum -= float(profile.latitude)
+        group.longitude_sum -= float(profile.longitude)
+        group.age_sum -= profile.age
+        return profile
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, row_id: int) -> bool:
+        return row_id in self._rows
+
+    def __getitem__(self, row_id: int) -> Profile:
+        return self._rows[row_id]
+
+    def __iter__(self):
+        return iter(self._rows.values())
+
+    def row_ids(self, blood_type: str) -> Tuple[int, ...]:
+        """Returns the ids of the rows with `blood_type`, in insertion order."""
+        group = self._groups.get(blood_type)
+        return () if group is None else tuple(group.rows)
+
+    def blood_type_counts(self) -> Dict[str, int]:
+        """Returns the number of rows of each blood type."""
+        return {blood_type: len(group.rows) for blood_type, group in self._groups.items()}
+
+    def largest_blood_type(self) -> Optional[str]:
+        """Returns the most common blood type, or None if the index is empty."""
+        if not self._groups:
+            return None
+        return max(self._groups, key=lambda blood_type: len(self._groups[blood_type].rows))
+
+    def group_stats(self, blood_type: str) -> Optional[BloodGroupStats]:
+        """Returns the count, mean location and average age of one blood type, or None if it has no rows."""
+        group = self._groups.get(blood_type)
+        return None if group is None else group.stats()
+
+    def groups(self) -> Dict[str, BloodGroupStats]:
+        """Returns the BloodGroupStats of every blood type in the index."""
+        return {blood_type: group.stats() for blood_type, group in self._groups.items()}
+
+    def mean_current_location(self, blood_type: Optional[str] = None) -> Optional[Tuple[float, float]]:
+        """
+        Returns the mean (latitude, longitude) of all rows, or of the rows of `blood_type` if given.
+        Returns None if there are no such rows.
+        """
+        groups = self._selected_groups(blood_type)
+        count = sum(len(group.rows) for group in groups)
+        if not count:
+            return None
+        return (
+            float(sum(group.latitude_sum for group in groups) / count),
+            float(sum(group.longitude_sum for group in groups) / count)
+        )
+
+    def average_age(self, blood_type: Optional[str] = None) -> Optional[float]:
+        """
+        Returns the average age, rounded to two decimals, of all rows or of the rows of `blood_type` if given.
+        Returns None if there are no such rows.
+        """
+        groups = self._selected_groups(blood_type)
+        count = sum(len(group.rows) for group in groups)
+        if not count:
+            return None
+        return round(sum(group.age_sum for group in groups) / count, 2)
+
+    def _selected_groups(self, blood_type: Optional[str]) -> List[_BloodGroup]:
+        if blood_type is None:
+            return list(self._groups.values())
+        group = self._groups.get(blood_type)
+        return [] if group is None else [group]
+
+@timing_decorator
+def compare_performance(
+    n: int,
+    repeats: int = 5,
+    warmup: int = 1,
+    seed: Optional[int] = None,
+    max_repeats: int = 50
+) -> str:
+    """
+    Compares the performance of metric calculations using namedtuple vs dictionary implementations.
+
+    Both implementations run on the same profiles: the dictionaries are built from the generated namedtuples.
+    Each implementation is warmed up and then timed in alternating batches of `repeats` trials with the
+    garbage collector and the metrics registry switched off. A winner is declared only once the 95%
+    confidence intervals of the two mean times no longer overlap; batches are added until they separate
+    or `max_repeats` trials per implementation have run.
+
+    Args:
+        n (int): The number of profiles to generate and evaluate.
+        repeats (int): Number of timed trials per implementation in each batch. Default is 5.
+        warmup (int): Number of untimed runs before the first batch. Default is 1.
+        seed (Optional[int]): Seed for the profiles, so repeated comparisons run on the same data.
+        max_repeats (int): Maximum number of timed trials per implementation. Default is 50.
+
+    Returns:
+        str: A string indicating whether namedtuple or dictionary implementation is faster, or that the
+        difference is within noise.
+    """
+    profiles_tuples = generate_profiles_namedtuple(n, seed=seed)
+    profiles_dict = [profile._asdict() for profile in profiles_tuples]
+
+    named_tuple_times = []
+    dict_times = []
+    while True:
+        named_tuple_times += _time_trials(_namedtuple_metrics, profiles_tuples, repeats, warmup)
+        dict_times += _time_trials(_dict_metrics, profiles_dict, repeats, warmup)
+        warmup = 0
+        named_tuple_stats = _trial_statistics(named_tuple_times)
+        dict_stats = _trial_statistics(dict_times)
+        separated = _slower(dict_stats, named_tuple_stats) or _slower(named_tuple_stats, dict_stats)
+        if separated or len(named_tuple_times) >= max_repeats:
+            break
+
+    print("Named Tuple calculations: {:.4f} +/- {:.4f} seconds over {} trials".format(
+        named_tuple_stats['mean'], named_tuple_stats['ci95'], named_tuple_stats['trials']
+    ))
+    print("Dictionary calculations: {:.4f} +/- {:.4f} seconds over {} trials\n".format(
+        dict_stats['mean'], dict_stats['ci95'], dict_stats['trials']
+    ))
+
+    if _slower(dict_stats, named_tuple_stats):
+        return f"Namedtuple is {dict_stats['mean'] / named_tuple_stats['mean']:.2f} times faster than Dictionary."
+    if _slower(named_tuple_stats, dict_stats):
+        return f"Dictionary is {named_tuple_stats['mean'] / dict_stats['mean']:.2f} times faster than Namedtuple."
+    return "Namedtuple and Dictionary are within noise of each other (overlapping 95% confidence intervals)."
+
+"""
+--------------------------------------------------------------------------------------------------------------
+Benchmark harness: every metric implementation on identical data across a sweep of sizes, with warm-up,
+repeated trials, GC control and confidence intervals, producing a JSON report CI can diff against a baseline.
+--------------------------------------------------------------------------------------------------------------
+"""
+
+@dataclass(slots=True)
+class _DataclassProfile:
+    """Slotted dataclass, used as a benchmark contender."""
+    blood_type: str
+    latitude: float
+    longitude: float
+    age: int
+
+def _namedtuple_metrics(profiles) -> tuple:
+    """Runs the four namedtuple metric functions on any rows with the Profile attributes."""
+    ages = AgeHistogram.from_profiles(profiles)
+    return (
+        largest_blood_type_namedtuple(profiles),
+        mean_current_location_namedtuple(profiles),
+        oldest_person_age_namedtuple(ages),
+        average_age_namedtuple(ages)
+    )
+
+def _dict_metrics(profiles) -> tuple:
+    """Runs the four dictionary metric functions."""
+    return (
+        largest_blood_type_dict(profiles),
+        mean_current_location_dict(profiles),
+        oldest_person_age_dict(profiles),
+        average_age_dict(profiles)
+    )
+
+def _table_metrics(table) -> tuple:
+    """Runs the four namedtuple metric functions on a ProfileTable."""
+    return (
+        largest_blood_type_namedtuple(table),
+        mean_current_location_namedtuple(table),
+        oldest_person_age_namedtuple(table),
+        average_age_namedtuple(table)
+    )
+
+# Benchmark contenders: name -> (build the representation from Profile namedtuples, run the four metrics on it)
+BENCHMARK_CONTENDERS = {
+    'namedtuple': (tuple, _namedtuple_metrics),
+    'dict': (lambda profiles: [profile._asdict() for profile in profiles], _dict_metrics),
+    'slots': (to_profile_records, _namedtuple_metrics),
+    'dataclass_slots': (lambda profiles: [_DataclassProfile(*profile) for profile in profiles], _namedtuple_metrics),
+    'profile_table': (ProfileTable.from_profiles, _table_metrics),
+}
+
+# Two-sided 95% Student t critical values by degrees of freedom; 1.96 is used beyond the table
+_T_CRITICAL_95 = (
+    12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+    2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+    2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042
+)
+
+def _time_trials(run, data, repeats: int, warmup: int) -> List[float]:
+    """
+    Times `run(data)` `repeats` times after `warmup` untimed runs.
+
+    The garbage collector is collected once and then disabled during the trials, and the metrics registry
+    is switched off so instrumentation is not part of the measured time.
+    """
+    with metrics.disabled():
+        for _ in range(warmup):
+            run(data)
+        gc_was_enabled = gc.isenabled()
+        gc.collect()
+        gc.disable()
+        try:
+            times = []
+            for _ in range(repeats):
+                start = perf_counter()
+                run(data)
+                times.append(perf_counter() - start)
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+    return times
+
+def _trial_statistics(times: List[float]) -> Dict[str, float]:
+    """Summarizes trial times with the mean, median, spread and a 95% confidence interval half-width."""
+    mean = statistics.fmean(times)
+    stdev = statistics.stdev(times) if len(times) > 1 else 0.0
+    degrees = len(times) - 1
+    critical = _T_CRITICAL_95[degrees - 1] if 0 < degrees <= len(_T_CRITICAL_95) else 1.96
+    return {
+        'mean': mean,
+        'median': statistics.median(times),
+        'min': min(times),
+        'max': max(times),
+        'stdev': stdev,
+        'ci95': critical * stdev / len(times) ** 0.5,
+        'trials': len(times),
+    }
+
+def _slower(first: Dict[str, float], second: Dict[str, float]) -> bool:
+    """Returns True if the 95% confidence interval of `first` lies entirely above that of `second`."""
+    return first['mean'] - first['ci95'] > second['mean'] + second['ci95']
+
+def run_benchmarks(
+    sizes: Tuple[int, ...] = (1000, 10000, 100000, 1000000, 10000000),
+    repeats: int = 5,
+    warmup: int = 1,
+    seed: int = 0,
+    contenders: Optional[Tuple[str, ...]] = None,
+    memory: bool = False
+) -> Dict:
+    """
+    Benchmarks the profile metrics for every contender across a sweep of population sizes.
+
+    For each size one set of profiles is generated with the seeded fast generator and every contender
+    is built from those same rows, so all implementations compute the same answers on the same data.
+
+    Args:
+        sizes (Tuple[int, ...]): Population sizes to benchmark. Default is 1e3 to 1e7.
+        repeats (int): Number of timed trials per contender and size. Default is 5.
+        warmup (int): Number of untimed runs before the trials. Default is 1.
+        seed (int): Seed for the generated profiles. Default is 0.
+        contenders (Optional[Tuple[str, ...]]): Names from BENCHMARK_CONTENDERS to run. Default is all.
+        memory (bool): Also record `total_bytes`, `bytes_per_row` and `metric_peak_bytes` for each entry,
+            measured in a separate traced run outside the timed trials.
+
+    Returns:
+        Dict: A JSON-serializable report with a `meta` section and one `results` entry per contender
+        and size, holding the timing statistics in seconds.
+
+    Raises:
+        ValueError: If an unknown contender is requested or repeats is less than 1.
+    """
+    names = tuple(BENCHMARK_CONTENDERS) if contenders is None else tuple(contenders)
+    unknown = [name for name in names if name not in BENCHMARK_CONTENDERS]
+    if unknown:
+        raise ValueError(f"Unknown benchmark contenders: {', '.join(unknown)}")
+    if repeats < 1:
+        raise ValueError("repeats must be at least 1")
+
+    results = []
+    for size in sizes:
+        profiles = generate_profiles_namedtuple(size, fast=True, seed=seed)
+        for name in names:
+            build, run = BENCHMARK_CONTENDERS[name]
+            data = build(profiles)
+            entry = {'contender': name, 'size': size}
+            entry.update(_trial_statistics(_time_trials(run, data, repeats, warmup)))
+            if memory:
+                total_bytes = deep_sizeof(data)
+                with metrics.disabled():
+                    entry['metric_peak_bytes'] = _traced_peak(run, data)[1]
+                entry['total_bytes'] = total_bytes
+                entry['bytes_per_row'] = total_bytes / size if size else 0.0
+            results.append(entry)
+            del data
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'seed': seed,
+            'repeats': repeats,
+            'warmup': warmup,
+        },
+        'results': results,
+    }
+
+def compare_benchmark_reports(current: Dict, baseline: Dict, tolerance: float = 0.1) -> List[Dict]:
+    """
+    Finds regressions between two reports produced by `run_benchmarks`.
+
+    A contender regresses at a size when its mean is more than `tolerance` slower than the baseline and
+    the two 95% confidence intervals do not overlap, so noise alone does not fail a CI run.
+
+    Args:
+        current (Dict): The report for the code under test.
+        baseline (Dict): The stored reference report.
+        tolerance (float): Allowed relative slowdown. Default is 0.1 (10%).
+
+    Returns:
+        List[Dict]: One entry per regression with the contender, size, both means and the slowdown ratio.
+    """
+    reference = {(entry['contender'], entry['size']): entry for entry in baseline['results']}
+    regressions = []
+    for entry in current['results']:
+        before = reference.get((entry['contender'], entry['size']))
+        if before is None:
+            continue
+        ratio = entry['mean'] / before['mean'] if before['mean'] else float('inf')
+        if ratio > 1 + tolerance and _slower(entry, before):
+            regressions.append({
+                'contender': entry['contender'],
+                'size': entry['size'],
+                'baseline_mean': before['mean'],
+                'current_mean': entry['mean'],
+                'ratio': ratio,
+            })
+    return regressions
+
+def deep_sizeof(obj) -> int:
+    """
+    Returns the memory used by `obj` and everything it references, in bytes.
+
+    Containers, dictionaries, `__dict__` and `__slots__` attributes are followed recursively. Each object is
+    counted once, so strings shared between rows (like interned blood types) are not double-counted.
+    Classes, modules and functions are not followed.
+    """
+    seen = set()
+    total = 0
+    stack = [obj]
+    while stack:
+        item = stack.pop()
+        if id(item) in seen or isinstance(item, (type, type(sys), type(deep_sizeof))):
+            continue
+        seen.add(id(item))
+        total += sys.getsizeof(item)
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (tuple, list, set, frozenset)):
+            stack.extend(item)
+        elif not isinstance(item, (str, bytes, bytearray, array, int, float)):
+            if hasattr(item, '__dict__'):
+                stack.append(item.__dict__)
+            for klass in type(item).__mro__:
+                for slot in getattr(klass, '__slots__', ()):
+                    if hasattr(item, slot):
+                        stack.append(getattr(item, slot))
+    return total
+
+def _traced_peak(func, *args, **kwargs) -> Tuple[object, int]:
+    """
+    Calls `func` and returns its result with the peak memory it allocated, as traced by `tracemalloc`.
+
+    Tracing is started for the call if it is not already running.
+    """
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        result = func(*args, **kwargs)
+        peak = tracemalloc.get_traced_memory()[1] - baseline
+    finally:
+        if started:
+            tracemalloc.stop()
+    return result, max(peak, 0)
+
+def compare_memory(n: int, fast: bool = False, seed: Optional[int] = None) -> Dict[str, Dict]:
+    """
+    Compares the memory footprint of the namedtuple and dictionary representations.
+
+    For each representation this measures the deep size of the generated collection, the peak memory traced
+    while generating it and the peak memory traced while computing each of the four metrics.
+
+    Args:
+        n (int): The number of profiles to generate.
+        fast (bool): Generate with the fast bulk draws instead of `fake.profile()`.
+        seed (Optional[int]): Seed for the fast draws, so both representations hold the same rows.
+
+    Returns:
+        Dict[str, Dict]: For 'namedtuple' and 'dict', the `total_bytes`, `bytes_per_row`,
+        `generation_peak_bytes` and a `metric_peak_bytes` mapping of metric name to peak bytes.
+    """
+    report = {}
+    with metrics.disabled():
+        profiles_tuples, generation_peak = _traced_peak(generate_profiles_namedtuple, n, fast=fast, seed=seed)
+        ages, ages_peak = _traced_peak(age_view, profiles_tuples)
+        total_bytes = deep_sizeof(profiles_tuples)
+        report['namedtuple'] = {
+            'total_bytes': total_bytes,
+            'bytes_per_row': total_bytes / n if n else 0.0,
+            'generation_peak_bytes': generation_peak,
+            'metric_peak_bytes': {
+                'largest_blood_type': _traced_peak(largest_blood_type_namedtuple, profiles_tuples)[1],
+                'mean_current_location': _traced_peak(mean_current_location_namedtuple, profiles_tuples)[1],
+                'ages_projection': ages_peak,
+                'oldest_person_age': _traced_peak(oldest_person_age_namedtuple, ages)[1],
+                'average_age': _traced_peak(average_age_namedtuple, ages)[1],
+            },
+        }
+        del profiles_tuples, ages
+
+        profiles_dict, generation_peak = _traced_peak(generate_profiles_dict, n, fast=fast, seed=seed)
+        total_bytes = deep_sizeof(profiles_dict)
+        report['dict'] = {
+            'total_bytes': total_bytes,
+            'bytes_per_row': total_bytes / n if n else 0.0,
+            'generation_peak_bytes': generation_peak,
+            'metric_peak_bytes': {
+                'largest_blood_type': _traced_peak(largest_blood_type_dict, profiles_dict)[1],
+                'mean_current_location': _traced_peak(mean_current_location_dict, profiles_dict)[1],
+                'oldest_person_age': _traced_peak(oldest_person_age_dict, profiles_dict)[1],
+                'average_age': _traced_peak(average_age_dict, profiles_dict)[1],
+            },
+        }
+    return report
+
+# Child script for `measure_startup`: times the import and reports it with the peak RSS and loaded modules
+_STARTUP_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import session8
+seconds = time.perf_counter() - start
+try:
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak *= 1 if sys.platform == 'darwin' else 1024
+except ImportError:
+    peak = None
+print(json.dumps({'seconds': seconds, 'peak_rss_bytes': peak, 'modules': sorted(sys.modules)}))
+"""
+
+def measure_startup(runs: int = 5) -> Dict[str, object]:
+    """
+    Measures the cost of `import session8` in fresh interpreters.
+
+    Each run starts a new Python process, so module caches from this process do not skew the timing.
+
+    Args:
+        runs (int): The number of interpreters to start.
+
+    Returns:
+        Dict[str, object]: The `runs`, the `median_seconds` and `max_seconds` of the import, the largest
+        `peak_rss_bytes` of a child (None where the `resource` module is unavailable) and `faker_loaded`,
+        which tells whether importing the module pulled in Faker.
+    """
+    import subprocess
+    if runs < 1:
+        raise ValueError("runs must be at least 1")
+    directory = os.path.dirname(os.path.abspath(__file__))
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, '-c', _STARTUP_SCRIPT], cwd=directory, capture_output=True, text=True, check=True
+        ).stdout
+        samples.append(json.loads(output))
+    seconds = [sample['seconds'] for sample in samples]
+    peaks = [sample['peak_rss_bytes'] for sample in samples if sample['peak_rss_bytes'] is not None]
+    return {
+        'runs': runs,
+        'median_seconds': statistics.median(seconds),
+        'max_seconds': max(seconds),
+        'peak_rss_bytes': max(peaks) if peaks else None,
+        'faker_loaded': any('faker' in sample['modules'] for sample in samples),
+    }
+
+"""
+--------------------------------------------------------------------------------------------------------------
+3. Create fake data (you can use Faker for company names) for an imaginary stock exchange for the top 100 companies 
+    (name, symbol, open, high, close). Assign a random weight to all the companies. Stock Market Value would be the sum 
+    of each_stock_value*random number/(sum of random values) or for 100 companies. Calculate and show what value the 
+    stock market started at, what was the highest value during the day, and where did it end. Make sure your open, high,
+    and close are not totally random. You can only use namedtuple. - 500 (including 10 test cases)
+--------------------------------------------------------------------------------------------------------------
+"""
+
+import re
+
+# Define the Stock namedtuple
+Stock = namedtuple('Stock', ['name', 'symbol', 'open', 'high', 'low', 'close', 'weight'])
+
+class StockRecord(_SlottedRecord):
+    """
+    Slotted drop-in for the Stock namedtuple, with interned ticker symbols.
+    """
+    __slots__ = Stock._fields
+    _fields = Stock._fields
+
+    def __init__(self, name: str, symbol: str, open: float, high: float, low: float, close: float, weight: float):
+        self.name = name
+        self.symbol = sys.intern(symbol)
+        self.open = open
+        self.high = high
+        self.low = low
+        self.close = close
+        self.weight = weight
+
+def to_stock_records(stocks) -> Tuple[StockRecord, ...]:
+    """
+    Converts Stock namedtuples (or any rows with the Stock fields in order) to StockRecords.
+
+    Args:
+        stocks: An iterable of Stock namedtuples.
+
+    Returns:
+        Tuple[StockRecord, ...]: The same rows as slotted records.
+    """
+    return tuple(map(StockRecord._make, stocks))
+
+class StockBook:
+    """
+    Columnar storage for a set of stocks.
+
+    Prices and weights are held as aligned float64 `array` columns, so market values are computed as dot
+    products over contiguous buffers instead of attribute lookups on one namedtuple per stock.
+
+    Attributes:
+        names (List[str]): Company name of each stock.
+        symbols (List[str]): Ticker symbol of each stock.
+        opens, highs, lows, closes, weights (array): Price and weight columns ('d').
+    """
+    __slots__ = ('names', 'symbols', 'opens', 'highs', 'lows', 'closes', 'weights')
+
+    def __init__(self, names=(), symbols=(), opens=(), highs=(), lows=(), closes=(), weights=()):
+        self.names = list(names)
+        self.symbols = list(symbols)
+        self.opens = array('d', opens)
+        self.highs = array('d', highs)
+        self.lows = array('d', lows)
+        self.closes = array('d', closes)
+        self.weights = array('d', weights)
+
+    @classmethod
+    def from_stocks(cls, stocks) -> 'StockBook':
+        """
+        Builds a StockBook from Stock namedtuples or StockRecords.
+
+        Args:
+            stocks: An iterable of rows with the Stock fields.
+
+        Returns:
+            StockBook: A book holding the same stocks.
+        """
+        stocks = tuple(stocks)
+        return cls(*(map(attrgetter(field), stocks) for field in Stock._fields))
+
+    def __len__(self) -> int:
+        return len(self.symbols)
+
+    def __getitem__(self, index: int) -> Stock:
+        return Stock(
+            self.names[index], self.symbols[index], self.opens[index], self.highs[index],
+            self.lows[index], self.closes[index], self.weights[index]
+        )
+
+    def __iter__(self):
+        return map(Stock, self.names, self.symbols, self.opens, self.highs, self.lows, self.closes, self.weights)
+
+# math.sumprod is only available from Python 3.12
+_sumprod = getattr(math, 'sumprod', None)
+
+def _weighted_sum(values, weights, precise: bool = False) -> float:
+    """
+    Returns the dot product of two float columns.
+
+    The default uses `math.sumprod` where available (Python 3.12+), which is computed in C with extended
+    precision, and otherwise `sum(map(mul, ...))`. With `precise=True` the products are summed with
+    `math.fsum`, which is correctly rounded and at least as accurate as Kahan or pairwise summation.
+    """
+    if precise:
+        return math.fsum(map(mul, values, weights))
+    if _sumprod is not None:
+        return _sumprod(values, weights)
+    return sum(map(mul, values, weights))
+
+
+class _LazyPermutation:
+    """
+    Draws the integers 0..size-1 in random order without materializing them.
+
+    This is a Fisher-Yates shuffle where only the swapped positions are stored, so each draw is O(1) and
+    memory grows with the number of draws rather than with `size`.
+    """
+    __slots__ = ('remaining', '_swaps', '_rng')
+
+    def __init__(self, size: int, rng):
+        self.remaining = size
+        self._swaps = {}
+        self._rng = rng
+
+    def draw(self) -> int:
+        swaps = self._swaps
+        position = self._rng.randrange(self.remaining)
+        last = self.remaining - 1
+        value = swaps.get(position, position)
+        swaps[position] = swaps.pop(last, last)
+        if position == last:
+            del swaps[position]
+        self.remaining = last
+        return value
+
+class SymbolAllocator:
+    """
+    Hands out unique ticker symbols in bounded time.
+
+    Each company first gets a few tries at a symbol built from the letters of its own name, like a real
+    ticker. If those are taken, the symbol is drawn from a lazily shuffled permutation of all unused
+    3-letter symbols, then 4-letter and 5-letter ones once the shorter space is exhausted. Every draw
+    removes a symbol from its pool, so allocation never loops indefinitely, even as the number of
+    stocks approaches the size of the 3-letter space (17,576).
+
+    Args:
+        rng: Source of randomness with `choices` and `randrange`. Default is the `random` module.
+        lengths (Tuple[int, ...]): Symbol lengths to use, in order of preference. Default is (3, 4, 5).
+        name_attempts (int): Number of name-derived symbols to try before drawing from the pool. Default is 3.
+    """
+
+    def __init__(self, rng=random, lengths: Tuple[int, ...] = (3, 4, 5), name_attempts: int = 3):
+        self._rng = rng
+        self.lengths = tuple(lengths)
+        self.name_attempts = name_attempts
+        self.used = set()
+        self._pools = {length: _LazyPermutation(26 ** length, rng) for length in self.lengths}
+
+    @staticmethod
+    def _encode(value: int, length: int) -> str:
+        letters = []
+        for _ in range(length):
+            value, letter = divmod(value, 26)
+            letters.append(chr(65 + letter))
+        return ''.join(letters)
+
+    def allocate(self, name: str = '') -> str:
+        """
+        Returns a new unique symbol, preferring one made from the letters of `name`.
+
+        Raises:
+            ValueError: If every symbol of every configured length has been allocated.
+        """
+        used = self.used
+        shortest = self.lengths[0]
+        letters = ''.join(sorted(set(re.sub(r'[^A-Z]', '', name.upper()))))
+        if letters and self._pools[shortest].remaining:
+            for _ in range(self.name_attempts):
+                symbol = ''.join(self._rng.choices(letters, k=shortest))
+                if symbol not in used:
+                    used.add(symbol)
+                    return symbol
+        for length in self.lengths:
+            pool = self._pools[length]
+            while pool.remaining:
+                symbol = self._encode(pool.draw(), length)
+                if symbol not in used:
+                    used.add(symbol)
+                    return symbol
+        raise ValueError("all ticker symbols have been allocated")
+
+# Weighting schemes accepted by `stock_weights`
+WEIGHTING_SCHEMES = ('random', 'market_cap', 'equal', 'capped')
+
+def normalize_weights(weights, cap: Optional[float] = None):
+    """
+    Scales a weight column in place so that it sums to exactly 1.
+
+    The total is taken with `math.fsum`, which is correctly rounded, and the few ulps by which the scaled
+    weights can still miss 1 are folded into the largest adjustable weight, so `math.fsum(weights) == 1.0`
+    holds exactly and index values computed from the weights are reproducible. With `cap`, weights above the
+    cap are set to it and the excess is spread over the other weights in proportion to their size, repeated
+    until no weight exceeds the cap, as capped indices do.
+
+    Args:
+        weights: A writable float column (`array('d')`, list or memoryview) of non-negative weights.
+        cap (Optional[float]): Maximum weight of a single entry.
+
+    Returns:
+        The same column, normalized.
+
+    Raises:
+        ValueError: If a weight is negative, the weights sum to 0, or the cap is too small to reach a
+            total of 1 with the non-zero weights.
+    """
+    count = len(weights)
+    total = math.fsum(weights)
+    if min(weights, default=0.0) < 0 or total <= 0:
+        raise ValueError("weights must be non-negative with a positive sum")
+    # Capping spreads the excess in proportion to the weights, so zero weights can never take any of it
+    if cap is not None and cap * sum(1 for weight in weights if weight > 0) < 1:
+        raise ValueError("cap is too small for the number of non-zero weights")
+    weights[:] = array('d', map(truediv, weights, repeat(total)))
+
+    capped = set()
+    if cap is not None:
+        while True:
+            over = [index for index in range(count) if index not in capped and weights[index] > cap]
+            if not over:
+                break
+            capped.update(over)
+            free = [index for index in range(count) if index not in capped]
+            free_total = math.fsum(weights[index] for index in free)
+            if free_total <= 0:
+                raise ValueError("cap is too small for the number of non-zero weights")
+            scale = (1.0 - cap * len(capped)) / free_total
+            for index in free:
+                weights[index] *= scale
+            for index in capped:
+                weights[index] = cap
+
+    adjustable = [index for index in range(count) if index not in capped] or list(range(count))
+    largest = max(adjustable, key=weights.__getitem__)
+    for _ in range(4):
+        residual = 1.0 - math.fsum(weights)
+        if not residual:
+            break
+        weights[largest] += residual
+    return weights
+
+def stock_weights(opens, scheme: str = 'random', cap: float = 0.1, rng=random) -> array:
+    """
+    Returns normalized index weights for stocks with the given opening prices.
+
+    Schemes:
+        random: Uniform random weights, as `generate_stock_data` has always used.
+        equal: The same weight for every stock.
+        market_cap: Proportional to the opening price times a simulated number of shares outstanding,
+            drawn log-normally so a few large companies dominate, as in real indices.
+        capped: Market-cap weights with no stock above `cap`.
+
+    Args:
+        opens: The opening price of each stock.
+        scheme (str): One of WEIGHTING_SCHEMES. Default is 'random'.
+        cap (float): Maximum weight of one stock for the 'capped' scheme. Default is 0.1.
+        rng: Source of randomness with `random` and `lognormvariate`. Default is the `random` module.
+
+    Returns:
+        array: The weights ('d'), summing to exactly 1 under `math.fsum`.
+
+    Raises:
+        ValueError: If the scheme is unknown, there are no stocks, or `cap` is too small for 'capped'.
+    """
+    if scheme not in WEIGHTING_SCHEMES:
+        raise ValueError(f"scheme must be one of {', '.join(WEIGHTING_SCHEMES)}")
+    if not len(opens):
+        raise ValueError("at least one stock is required")
+    if scheme == 'random':
+        weights = array('d', [rng.random() for _ in range(len(opens))])
+    elif scheme == 'equal':
+        weights = array('d', repeat(1.0, len(opens)))
+    else:
+        weights = array('d', map(mul, opens, [rng.lognormvariate(0.0, 1.0) for _ in range(len(opens))]))
+    return normalize_weights(weights, cap if scheme == 'capped' else None)
+
+@timing_decorator
+def generate_stock_data(
+    num_stocks: int = 100,
+    start_range: int = 10,
+    end_range: int = 500,
+    weighting: str = 'random',
+    cap: float = 0.1,
+    seed: Optional[int] = None,
+    rng: Optional[random.Random] = None
+) -> Tuple[Stock, ...]:
+    """
+    Generates fake stock data for a specified number of stocks.
+
+    Prices are drawn per stock into columns, the weight column is computed and normalized in place by
+    `stock_weights`, and each Stock is built once from the finished columns.
+
+    Args:
+        num_stocks (int): The number of stocks to generate. Default is 100.
+        start_range (int): The minimum value for the stock price. Default is 10.
+        end_range (int): The maximum value for the stock price. Default is 500.
+        weighting (str): Weighting scheme, one of WEIGHTING_SCHEMES. Default is 'random'.
+        cap (float): Maximum weight of one stock for the 'capped' scheme. Default is 0.1.
+        seed (Optional[int]): Seed for the prices, weights, company names and symbols. The same seed gives
+            identical stocks. Without a seed or `rng` the global `random` module and the shared Faker are used.
+        rng (Optional[random.Random]): Random source to draw from instead of a seed.
+
+    Returns:
+        Tuple[Stock, ...]: A tuple of Stock namedtuples, each containing:
+            - name (str): The name of the company.
+            - symbol (str): The stock ticker symbol.
+            - open (float): The opening price of the stock.
+            - high (float): The highest price of the stock during the day.
+            - low (float): The lowest price of the stock during the day.
+            - close (float): The closing price of the stock.
+            - weight (float): The weight of the stock in a portfolio, at full precision and summing to exactly 1.
+
+    Raises:
+        ValueError: If the start_range is not less than the end_range, both seed and rng are given, or
+            from `stock_weights`.
+    """
+    if start_range >= end_range:
+        raise ValueError("start_range must be less than end_range")
+    rng = _resolve_rng(seed, rng, 'stocks', random)
+
+    names, symbols, opens, highs, lows, closes = [], [], [], [], [], []
+    allocator = SymbolAllocator(rng=rng)
+    uniform = rng.uniform
+
+    fake = _seeded_faker(rng)
+    while len(names) < num_stocks:
+        name = fake.company()
+        names.append(name)
+        symbols.append(allocator.allocate(name))
+
+        open_price = round(uniform(start_range, end_range), 4)
+        high_price = round(uniform(1.001, 1.15) * open_price, 4)
+        low_price = round(uniform(0.85, 1) * open_price, 4)
+        opens.append(open_price)
+        highs.append(high_price)
+        lows.append(low_price)
+        closes.append(round(uniform(low_price, high_price), 4))
+
+    weights = stock_weights(opens, weighting, cap, rng)
+    return tuple(map(Stock, names, symbols, opens, highs, lows, closes, weights))
+
+@timing_decorator
+def calculate_market_values(stocks: Tuple[Stock, ...], precise: bool = False) -> Tuple[float, float, float]:
+    """
+    Calculate the weighted market values for open, high, and close prices.
+
+    Args:
+        stocks (Tuple[Stock, ...]): A tuple of Stock namedtuples, each containing the open, high, close prices, and a weight,
+            or a StockBook.
+        precise (bool): If True, use correctly rounded summation (`math.fsum`) for the weighted sums.
+
+    Returns:
+        Tuple[float, float, float]: The weighted market open, high, and close values, rounded to four decimal places.
+    """
+    if isinstance(stocks, StockBook):
+        weights = stocks.weights
+        return (
+            round(_weighted_sum(stocks.opens, weights, precise), 4),
+            round(_weighted_sum(stocks.highs, weights, precise), 4),
+            round(_weighted_sum(stocks.closes, weights, precise), 4)
+        )
+    if precise:
+        market_open = math.fsum(stock.open * stock.weight for stock in stocks)
+        market_high = math.fsum(stock.high * stock.weight for stock in stocks)
+        market_close = math.fsum(stock.close * stock.weight for stock in stocks)
+        return round(market_open, 4), round(market_high, 4), round(market_close, 4)
+    market_open = sum(stock.open * stock.weight for stock in stocks)
+    market_high = sum(stock.high * stock.weight for stock in stocks)
+    market_close = sum(stock.close * stock.weight for stock in stocks)
+    return round(market_open, 4), round(market_high, 4), round(market_close, 4)
+
+# True intraday market index: open, highest, lowest and closing value of the weighted price path, and the path itself
+IntradayIndex = namedtuple('IntradayIndex', 'open high low close path')
+
+def _intraday_path(stock, ticks: int, rng: random.Random) -> List[float]:
+    """
+    Simulates one stock's price path over `ticks` ticks, constrained to its open/high/low/close.
+
+    The path starts at the open and ends at the close, and touches the high and the low at two random
+    interior ticks. Between these anchors it follows a geometric Brownian bridge (a Brownian bridge on log
+    prices) reflected back into [low, high], so the simulated path reproduces the stock's OHLC exactly.
+    """
+    last = ticks - 1
+    high_tick, low_tick = rng.sample(range(1, last), 2)
+    anchors = sorted(((0, stock.open), (high_tick, stock.high), (low_tick, stock.low), (last, stock.close)))
+    log_low, log_high = math.log(stock.low), math.log(stock.high)
+    sigma = (log_high - log_low) / (2.0 * math.sqrt(ticks))
+    gauss = rng.gauss
+    exp = math.exp
+
+    def reflect(value: float) -> float:
+        if value > log_high:
+            value = 2.0 * log_high - value
+        elif value < log_low:
+            value = 2.0 * log_low - value
+        return exp(min(log_high, max(log_low, value)))
+
+    path = [stock.open]
+    for (start, start_price), (stop, stop_price) in zip(anchors, anchors[1:]):
+        steps = stop - start
+        walk = list(accumulate(gauss(0.0, sigma) for _ in range(steps)))
+        origin = math.log(start_price)
+        slope = (math.log(stop_price) - origin - walk[-1]) / steps
+        path.extend(reflect(origin + slope * step + walk[step - 1]) for step in range(1, steps))
+        path.append(stop_price)
+    return path
+
+def simulate_intraday(
+    stocks,
+    ticks: int = 390,
+    seed: Optional[int] = None,
+    rng: Optional[random.Random] = None
+) -> IntradayIndex:
+    """
+    Simulates tick-level price paths for every stock and computes the true weighted market index path.
+
+    `calculate_market_values` can only report the weighted sum of per-stock highs, which the index never
+    actually reaches unless every stock peaks at the same moment. Here each stock gets a price path
+    consistent with its open/high/low/close, and the index is the weighted sum of the paths at each tick,
+    giving the index's real intraday high and low.
+
+    Stocks are simulated one at a time and added into the index path, so memory is O(ticks) regardless of
+    the number of stocks; a full stocks x ticks matrix is never built.
+
+    Args:
+        stocks: A tuple of Stock namedtuples or a StockBook. Prices must be positive.
+        ticks (int): Number of ticks in the trading day, including open and close. Default is 390 (one per minute).
+        seed (Optional[int]): Seed for the simulated paths.
+        rng (Optional[random.Random]): Random source to draw from instead of a seed.
+
+    Returns:
+        IntradayIndex: The index open, high, low and close, and the full index path as an `array('d')`.
+
+    Raises:
+        ValueError: If ticks is less than 4, there are no stocks, or both seed and rng are given.
+    """
+    if ticks < 4:
+        raise ValueError("ticks must be at least 4")
+    rng = _resolve_rng(seed, rng, 'intraday')
+    index = [0.0] * ticks
+    simulated = 0
+    for stock in stocks:
+        weight = stock.weight
+        index = list(map(add, index, map(mul, repeat(weight), _intraday_path(stock, ticks, rng))))
+        simulated += 1
+    if not simulated:
+        raise ValueError("at least one stock is required")
+    path = array('d', index)
+    return IntradayIndex(path[0], max(path), min(path), path[-1], path)
+
+class MarketIndex:
+    """
+    Live weighted market index that is kept current as individual prices change.
+
+    Rebuilding the Stock tuple with `_replace` and re-running `calculate_market_values` costs O(n) per price
+    change. MarketIndex instead keeps the weighted running sum and adjusts it by `weight * (new - old)` for
+    each update, so every update is O(1), and tracks the running index high and low alongside.
+
+    The running sum is recomputed exactly with `math.fsum` every `resync_interval` updates (and on `resync()`),
+    so floating point drift cannot build up over long feeds.
+
+    Attributes:
+        open (float): Index value when the index was built.
+        value (float): Current index value.
+        high (float): Highest index value seen.
+        low (float): Lowest index value seen.
+        updates (int): Number of price updates applied.
+    """
+
+    def __init__(self, stocks, price: str = 'open', resync_interval: int = 1000000):
+        """
+        Builds the index from Stock namedtuples, StockRecords or a StockBook.
+
+        Args:
+            stocks: The index constituents.
+            price (str): Stock field holding each constituent's starting price. Default is 'open'.
+            resync_interval (int): Number of updates between exact recomputations of the running sum.
+
+        Raises:
+            ValueError: If `price` is not a price field of Stock or resync_interval is not positive.
+        """
+        if price not in ('open', 'high', 'low', 'close'):
+            raise ValueError("price must be one of 'open', 'high', 'low' or 'close'")
+        if resync_interval <= 0:
+            raise ValueError("resync_interval must be positive")
+        self._entries = {stock.symbol: [stock.weight, getattr(stock, price)] for stock in stocks}
+        self.resync_interval = resync_interval
+        self.updates = 0
+        self._next_resync = resync_interval
+        self.value = self._exact_value()
+        self.open = self.high = self.low = self.value
+
+    def _exact_value(self) -> float:
+        return math.fsum(weight * price for weight, price in self._entries.values())
+
+    def resync(self) -> float:
+        """Recomputes the index value exactly from the current prices and returns it."""
+        self.value = self._exact_value()
+        self._next_resync = self.updates + self.resync_interval
+        return self.value
+
+    def price(self, symbol: str) -> float:
+        """Returns the last price seen for `symbol`."""
+        return self._entries[symbol][1]
+
+    def update(self, symbol: str, price: float) -> float:
+        """
+        Applies one price change in O(1) and returns the new index value.
+
+        Raises:
+            KeyError: If `symbol` is not a constituent of the index.
+        """
+        entry = self._entries[symbol]
+        value = self.value + entry[0] * (price - entry[1])
+        entry[1] = price
+        self.updates += 1
+        if self.updates >= self._next_resync:
+            value = self.resync()
+        self.value = value
+        if value > self.high:
+            self.high = value
+        elif value < self.low:
+            self.low = value
+        return value
+
+    def update_many(self, events) -> float:
+        """
+        Applies a batch of `(symbol, price)` updates and returns the index value after the last one.
+
+        This is the fast path for feed replay: the per-update work is the same as `update` but runs in a
+        single loop with local variables.
+
+        Raises:
+            KeyError: If a symbol is not a constituent of the index.
+        """
+        entries = self._entries
+        value, high, low = self.value, self.high, self.low
+        updates, next_resync = self.updates, self._next_resync
+        for symbol, price in events:
+            entry = entries[symbol]
+            value += entry[0] * (price - entry[1])
+            entry[1] = price
+            updates += 1
+            if updates >= next_resync:
+                self.updates = updates
+                value = self.resync()
+                next_resync = self._next_resync
+            if value > high:
+                high = value
+            elif value < low:
+                low = value
+        self.value, self.high, self.low = value, high, low
+        self.updates, self._next_resync = updates, next_resync
+        return value
+
+    def snapshot(self) -> Tuple[float, float, float, float]:
+        """Returns the index (open, high, low, current value), each rounded to four decimal places."""
+        return round(self.open, 4), round(self.high, 4), round(self.low, 4), round(self.value, 4)
+
+class MarketHistory:
+    """
+    Daily OHLC prices of a fixed set of stocks over several trading days, stored column-wise.
+
+    Each price column is one float64 `array` of `days * len(symbols)` values in day-major order, so the
+    prices of day `d` are the contiguous slice `[d * len(symbols), (d + 1) * len(symbols))`. `day(d)` returns
+    that slice as a StockBook of zero-copy memoryviews, which every StockBook function accepts.
+
+    Attributes:
+        days (int): Number of trading days.
+        names (List[str]): Company name of each stock.
+        symbols (List[str]): Ticker symbol of each stock.
+        weights (array): Index weight of each stock, the same on every day ('d').
+        opens, highs, lows, closes (array): Price columns of all days ('d').
+        index_opens, index_highs, index_closes (array): The market index open, high and close of each
+            day, as computed by `calculate_market_values` ('d').
+    """
+    __slots__ = (
+        'days', 'names', 'symbols', 'weights', 'opens', 'highs', 'lows', 'closes',
+        'index_opens', 'index_highs', 'index_closes'
+    )
+
+    def __init__(self, names, symbols, weights):
+        self.days = 0
+        self.names = list(names)
+        self.symbols = list(symbols)
+        self.weights = array('d', weights)
+        self.opens = array('d')
+        self.highs = array('d')
+        self.lows = array('d')
+        self.closes = array('d')
+        self.index_opens = array('d')
+        self.index_highs = array('d')
+        self.index_closes = array('d')
+
+    def __len__(self) -> int:
+        return self.days
+
+    def day(self, day: int) -> StockBook:
+        """
+        Returns the stocks of one trading day as a StockBook of views into the price columns.
+
+        Raises:
+            IndexError: If `day` is out of range. Negative days count from the end.
+        """
+        if day < 0:
+            day += self.days
+        if not 0 <= day < self.days:
+            raise IndexError("day out of range")
+        start = day * len(self.symbols)
+        stop = start + len(self.symbols)
+        book = StockBook.__new__(StockBook)
+        book.names = self.names
+        book.symbols = self.symbols
+        book.weights = self.weights
+        book.opens = memoryview(self.opens)[start:stop]
+        book.highs = memoryview(self.highs)[start:stop]
+        book.lows = memoryview(self.lows)[start:stop]
+        book.closes = memoryview(self.closes)[start:stop]
+        return book
+
+    def __iter__(self):
+        return map(self.day, range(self.days))
+
+def simulate_market(
+    days: int = 250,
+    num_stocks: int = 100,
+    seed: Optional[int] = None,
+    start_range: int = 10,
+    end_range: int = 500,
+    weighting: str = 'random',
+    cap: float = 0.1,
+    rng: Optional[random.Random] = None
+) -> MarketHistory:
+    """
+    Simulates daily OHLC prices of `num_stocks` stocks over `days` trading days.
+
+    The first day's opens are drawn between `start_range` and `end_range` and every later day opens at the
+    previous day's close. Within a day the prices follow `generate_stock_data`: the high is 0.1% to 15% above
+    the open, the low up to 15% below it and the close between the low and the high, so low <= open <= high
+    and low <= close <= high always hold. Prices are kept at full precision.
+
+    Each day is generated as a batch of columns from one bulk draw per field rather than row by row with
+    namedtuples, which makes 250 days of 5,000 stocks a matter of seconds.
+
+    Args:
+        days (int): Number of trading days. Default is 250.
+        num_stocks (int): Number of stocks. Default is 100.
+        seed (Optional[int]): Seed for the prices, weights, company names and symbols.
+        start_range (int): The minimum opening price on the first day. Default is 10.
+        end_range (int): The maximum opening price on the first day. Default is 500.
+        weighting (str): Weighting scheme, one of WEIGHTING_SCHEMES, applied to the first day's opens.
+        cap (float): Maximum weight of one stock for the 'capped' scheme. Default is 0.1.
+        rng (Optional[random.Random]): Random source to draw from instead of a seed.
+
+    Returns:
+        MarketHistory: The price columns of all days together with the daily market index values.
+
+    Raises:
+        ValueError: If days or num_stocks is less than 1, start_range is not less than end_range, or both
+            seed and rng are given.
+    """
+    if days < 1 or num_stocks < 1:
+        raise ValueError("days and num_stocks must be at least 1")
+    if start_range >= end_range:
+        raise ValueError("start_range must be less than end_range")
+    rng = _resolve_rng(seed, rng, 'market')
+    faker = _seeded_faker(rng)
+    allocator = SymbolAllocator(rng=rng)
+    names = [faker.company() for _ in range(num_stocks)]
+    symbols = list(map(allocator.allocate, names))
+
+    uniform = rng.random
+    span = end_range - start_range
+    opens = [start_range + span * uniform() for _ in range(num_stocks)]
+    history = MarketHistory(names, symbols, stock_weights(opens, weighting, cap, rng))
+    for _ in range(days):
+        highs = [price * (1.001 + 0.149 * uniform()) for price in opens]
+        lows = [price * (0.85 + 0.15 * uniform()) for price in opens]
+        closes = [low + (high - low) * uniform() for low, high in zip(lows, highs)]
+        history.opens.extend(opens)
+        history.highs.extend(highs)
+        history.lows.extend(lows)
+        history.closes.extend(closes)
+        history.days += 1
+        market_open, market_high, market_close = calculate_market_values(history.day(-1))
+        history.index_opens.append(market_open)
+        history.index_highs.append(market_high)
+        history.index_closes.append(market_close)
+        opens = closes
+    return history
+
+# Rolling analytics of the market index after one trading day
+RollingSnapshot = namedtuple(
+    'RollingSnapshot', 'day open high low close moving_average rolling_high rolling_low max_drawdown'
+)
+
+def _drawdown_partial(left: Tuple[float, float, float], right: Tuple[float, float, float]) -> Tuple:
+    """
+    Combines the (max, min, largest drop) partials of two adjacent runs of log index values.
+
+    The largest drop of the joined run is the larger of the two runs' own drops and the drop from the
+    left run's maximum to the right run's minimum. The combination is associative, which is what the
+    two-stack sliding window in RollingIndex relies on.
+    """
+    return (
+        max(left[0], right[0]),
+        min(left[1], right[1]),
+        max(left[2], right[2], left[0] - right[1])
+    )
+
+class RollingIndex:
+    """
+    Rolling analytics of the weighted market index over the last `window` trading days.
+
+    Days are appended one at a time, and every statistic is updated in O(1) amortized time per day,
+    independent of the window length. The moving average of the index close comes from a running sum,
+    recomputed exactly with `math.fsum` once per `window` days so floating point drift cannot build up.
+    The rolling high and low come from monotonic deques of the daily highs and lows, and the rolling
+    maximum drawdown of the closes from a two-stack sliding window of (max, min, largest drop) partials
+    over log closes.
+
+    Per-symbol contributions to the index move over the window are computed on demand in O(stocks).
+
+    Attributes:
+        window (int): Number of trading days in the window.
+        days (int): Number of days appended so far.
+        closes (array): Index close of every day appended ('d').
+    """
+
+    def __init__(self, window: int = 20):
+        """
+        Raises:
+            ValueError: If window is less than 1.
+        """
+        if window < 1:
+            raise ValueError("window must be at least 1")
+        self.window = window
+        self.days = 0
+        self.closes = array('d')
+        self._close_sum = 0.0
+        self._highs = deque()
+        self._lows = deque()
+        self._front = []
+        self._back = []
+        self._back_partial = None
+        self._symbols = None
+        self._weights = None
+        self._window_opens = deque(maxlen=window)
+        self._last_closes = None
+        self._last = None
+
+    @classmethod
+    def from_history(cls, history: MarketHistory, window: int = 20) -> Tuple['RollingIndex', List[RollingSnapshot]]:
+        """
+        Replays every day of a MarketHistory.
+
+        Returns:
+            Tuple[RollingIndex, List[RollingSnapshot]]: The rolling index after the last day and the
+            snapshot of every day.
+        """
+        rolling = cls(window)
+        return rolling, [rolling.append(book) for book in history]
+
+    def append(self, stocks) -> RollingSnapshot:
+        """
+        Adds one trading day and returns the updated rolling snapshot.
+
+        Args:
+            stocks: The day's Stock namedtuples or StockBook, with the same symbols and weights every day.
+
+        Returns:
+            RollingSnapshot: The day's index values and the rolling statistics including this day.
+
+        Raises:
+            ValueError: If the stocks do not match the symbols of the first day.
+        """
+        book = stocks if isinstance(stocks, StockBook) else StockBook.from_stocks(stocks)
+        if self._symbols is None:
+            self._symbols = list(book.symbols)
+            self._weights = array('d', book.weights)
+        elif list(book.symbols) != self._symbols:
+            raise ValueError("every day must have the same stocks in the same order")
+        market_open, market_high, market_close = calculate_market_values(book)
+        market_low = round(_weighted_sum(book.lows, book.weights), 4)
+        self._window_opens.append(array('d', book.opens))
+        self._last_closes = array('d', book.closes)
+        return self._advance(market_open, market_high, market_low, market_close)
+
+    def _advance(self, market_open: float, market_high: float, market_low: float, market_close: float):
+        day = self.days
+        window = self.window
+        self.days += 1
+        self.closes.append(market_close)
+        expired = day - window
+
+        self._close_sum += market_close
+        if expired >= 0:
+            self._close_sum -= self.closes[expired]
+        if self.days % window == 0:
+            self._close_sum = math.fsum(self.closes[-window:])
+
+        highs, lows = self._highs, self._lows
+        while highs and highs[-1][1] <= market_high:
+            highs.pop()
+        highs.append((day, market_high))
+        while lows and lows[-1][1] >= market_low:
+            lows.pop()
+        lows.append((day, market_low))
+        if highs[0][0] <= expired:
+            highs.popleft()
+        if lows[0][0] <= expired:
+            lows.popleft()
+
+        self._push_close(math.log(market_close))
+        if expired >= 0:
+            self._pop_close()
+        partial = self._front[-1][1] if self._front else None
+        if self._back_partial is not None:
+            partial = self._back_partial if partial is None else _drawdown_partial(partial, self._back_partial)
+
+        self._last = RollingSnapshot(
+            day,
+            market_open,
+            market_high,
+            market_low,
+            market_close,
+            round(self._close_sum / min(self.days, window), 4),
+            highs[0][1],
+            lows[0][1],
+            1.0 - math.exp(-partial[2])
+        )
+        return self._last
+
+    def _push_close(self, value: float) -> None:
+        partial = (value, value, 0.0)
+        self._back.append(value)
+        self._back_partial = partial if self._back_partial is None else _drawdown_partial(self._back_partial, partial)
+
+    def _pop_close(self) -> None:
+        front = self._front
+        if not front:
+            # Move the back stack to the front, newest first, storing for each value the partial of
+            # the run from that value up to the newest one
+            partial = None
+            for value in reversed(self._back):
+                single = (value, value, 0.0)
+                partial = single if partial is None else _drawdown_partial(single, partial)
+                front.append((value, partial))
+            self._back.clear()
+            self._back_partial = None
+        front.pop()
+
+    def snapshot(self) -> Optional[RollingSnapshot]:
+        """Returns the rolling snapshot after the last appended day, or None if no day was appended."""
+        return self._last
+
+    def contributions(self) -> Dict[str, float]:
+        """
+        Returns each symbol's contribution to the index move over the window.
+
+        The move runs from the index open on the first day of the window to the index close on the last
+        day, and each symbol contributes its weight times its own price change over the same span, so the
+        contributions add up to the index move.
+
+        Returns:
+            Dict[str, float]: Symbol mapped to its contribution, empty if no day was appended.
+        """
+        if not self._window_opens:
+            return {}
+        first_opens = self._window_opens[0]
+        return dict(zip(self._symbols, map(mul, self._weights, map(sub, self._last_closes, first_opens))))
+
+"""
+--------------------------------------------------------------------------------------------------------------
+On-disk columnar datasets: profiles and stocks saved as binary column files and loaded back through `mmap`
+without copying, so large datasets open instantly and processes reading the same file share its pages.
+--------------------------------------------------------------------------------------------------------------
+"""
+
+# File header: magic, format version, byte order ('<' or '>'), row count, column count
+_COLUMNAR_HEADER = struct.Struct('<8sHcxQI')
+# Column directory entry: column name, struct format of one item, byte offset in the file, byte length
+_COLUMNAR_ENTRY = struct.Struct('<16s2sxxQQ')
+_COLUMNAR_VERSION = 1
+_COLUMNAR_ALIGNMENT = 64
+_PROFILES_MAGIC = b'S8PROFIL'
+_STOCKS_MAGIC = b'S8STOCKS'
+
+def _write_columnar(path: str, magic: bytes, rows: int, columns: Dict[str, object]) -> None:
+    """
+    Writes `columns` (anything exporting a typed buffer) to `path` as a header, a column directory and
+    the raw column data, each column aligned to 64 bytes.
+    """
+    views = {name: memoryview(values) for name, values in columns.items()}
+    offset = _COLUMNAR_HEADER.size + _COLUMNAR_ENTRY.size * len(views)
+    entries = []
+    for name, view in views.items():
+        offset += -offset % _COLUMNAR_ALIGNMENT
+        entries.append(_COLUMNAR_ENTRY.pack(name.encode('ascii'), view.format.encode('ascii'), offset, view.nbytes))
+        offset += view.nbytes
+    byteorder = b'<' if sys.byteorder == 'little' else b'>'
+    with open(path, 'wb') as file:
+        file.write(_COLUMNAR_HEADER.pack(magic, _COLUMNAR_VERSION, byteorder, rows, len(views)))
+        file.writelines(entries)
+        for view in views.values():
+            file.write(bytes(-file.tell() % _COLUMNAR_ALIGNMENT))
+            file.write(view.cast('B'))
+
+def _read_columnar(path: str, magic: bytes) -> Tuple[int, Dict[str, memoryview]]:
+    """
+    Maps the column file at `path` read-only and returns its row count and a typed memoryview per column.
+
+    Raises:
+        ValueError: If the file is not a column file of the expected kind, version or byte order.
+    """
+    with open(path, 'rb') as file:
+        mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    if len(mapped) < _COLUMNAR_HEADER.size:
+        raise ValueError(f"{path} is not a session8 column file")
+    file_magic, version, byteorder, rows, count = _COLUMNAR_HEADER.unpack_from(mapped, 0)
+    if file_magic != magic:
+        raise ValueError(f"{path} is not a session8 {magic.decode('ascii')} column file")
+    if version != _COLUMNAR_VERSION:
+        raise ValueError(f"unsupported column file version {version}")
+    if byteorder != (b'<' if sys.byteorder == 'little' else b'>'):
+        raise ValueError("column file was written on a machine with a different byte order")
+    buffer = memoryview(mapped)
+    columns = {}
+    for index in range(count):
+        name, item_format, offset, nbytes = _COLUMNAR_ENTRY.unpack_from(
+            mapped, _COLUMNAR_HEADER.size + index * _COLUMNAR_ENTRY.size
+        )
+        columns[name.rstrip(b'\0').decode('ascii')] = buffer[offset:offset + nbytes].cast(
+            item_format.rstrip(b'\0').decode('ascii')
+        )
+    return rows, columns
+
+def _encode_strings(strings) -> Tuple[bytes, array]:
+    """Packs strings into one UTF-8 blob plus an array of end offsets."""
+    encoded = [string.encode('utf-8') for string in strings]
+    return b''.join(encoded), array('Q', accumulate(map(len, encoded)))
+
+def _decode_strings(blob: memoryview, ends: memoryview) -> List[str]:
+    """Unpacks strings written by `_encode_strings`."""
+    data = bytes(blob)
+    starts = chain((0,), ends)
+    return [data[start:end].decode('utf-8') for start, end in zip(starts, ends)]
+
+def save_profiles(path: str, profiles) -> None:
+    """
+    Saves profiles to a binary columnar file.
+
+    Args:
+        path (str): Destination file path.
+        profiles: Profile namedtuples, profile dictionaries or a ProfileTable.
+    """
+    table = _as_table(profiles)
+    blood_types, blood_type_ends = _encode_strings(table.blood_types)
+    _write_columnar(path, _PROFILES_MAGIC, len(table), {
+        'blood_types': blood_types,
+        'blood_type_ends': blood_type_ends,
+        'blood_codes': table.blood_codes,
+        'latitudes': table.latitudes,
+        'longitudes': table.longitudes,
+        'ages': table.ages,
+    })
+
+def load_profiles(path: str) -> ProfileTable:
+    """
+    Opens a file written by `save_profiles` as a ProfileTable backed by the memory-mapped file.
+
+    Only the small blood type dictionary is decoded; the columns are zero-copy views of the mapped file,
+    so opening is effectively instant and processes mapping the same file share its pages. The table is
+    read-only, and every function that accepts a ProfileTable works on it directly.
+
+    Args:
+        path (str): Path of the file to open.
+
+    Returns:
+        ProfileTable: A read-only table over the mapped columns.
+
+    Raises:
+        ValueError: If the file is not a profile column file.
+    """
+    _, columns = _read_columnar(path, _PROFILES_MAGIC)
+    table = ProfileTable(_decode_strings(columns['blood_types'], columns['blood_type_ends']))
+    table.blood_codes = columns['blood_codes']
+    table.latitudes = columns['latitudes']
+    table.longitudes = columns['longitudes']
+    table.ages = columns['ages']
+    return table
+
+def save_stocks(path: str, stocks) -> None:
+    """
+    Saves stocks to a binary columnar file.
+
+    Args:
+        path (str): Destination file path.
+        stocks: Stock namedtuples, StockRecords or a StockBook.
+    """
+    book = stocks if isinstance(stocks, StockBook) else StockBook.from_stocks(stocks)
+    names, name_ends = _encode_strings(book.names)
+    symbols, symbol_ends = _encode_strings(book.symbols)
+    _write_columnar(path, _STOCKS_MAGIC, len(book), {
+        'names': names,
+        'name_ends': name_ends,
+        'symbols': symbols,
+        'symbol_ends': symbol_ends,
+        'opens': book.opens,
+        'highs': book.highs,
+        'lows': book.lows,
+        'closes': book.closes,
+        'weights': book.weights,
+    })
+
+def load_stocks(path: str) -> StockBook:
+    """
+    Opens a file written by `save_stocks` as a StockBook whose price and weight columns are zero-copy views
+    of the memory-mapped file. Names and symbols are decoded into lists.
+
+    Args:
+        path (str): Path of the file to open.
+
+    Returns:
+        StockBook: A read-only book over the mapped columns.
+
+    Raises:
+        ValueError: If the file is not a stock column file.
+    """
+    _, columns = _read_columnar(path, _STOCKS_MAGIC)
+    book = StockBook(
+        _decode_strings(columns['names'], columns['name_ends']),
+        _decode_strings(columns['symbols'], columns['symbol_ends'])
+    )
+    book.opens = columns['opens']
+    book.highs = columns['highs']
+    book.lows = columns['lows']
+    book.closes = columns['closes']
+    book.weights = columns['weights']
+    return book
+
+"""
+--------------------------------------------------------------------------------------------------------------
+Dataset cache: memoizes deterministic generator calls, keyed by the generator and its arguments.
+--------------------------------------------------------------------------------------------------------------
+"""
+
+CacheInfo = namedtuple('CacheInfo', 'hits misses evictions disk_hits size maxsize')
+
+# Marks a cache miss, so that None can be cached like any other result
+_MISSING = object()
+
+# Generators whose output depends on today's date, since ages are computed against it
+_DATED_GENERATORS = frozenset({'generate_profiles_namedtuple', 'generate_profiles_dict', 'generate_profiles_table'})
+
+class DatasetCache:
+    """
+    Size-bounded LRU cache for generated datasets, in memory and optionally on disk.
+
+    Entries are keyed by a SHA-256 digest of the generator's module and qualified name and its bound
+    arguments (with defaults applied, so `f(10)` and `f(n=10)` share an entry). The profile generators
+    compute ages against today's date, so their keys also include the date and an entry written on one day
+    is not served on the next. By default only calls with an explicit, non-None `seed` are cached, since
+    unseeded calls are meant to be random.
+
+    Cached results are shared between callers and must be treated as read-only. Iterators and async
+    iterators, such as those of `iter_profiles` and `agenerate_profiles`, can only be consumed once, so
+    they are returned without being cached.
+
+    Args:
+        maxsize (int): Maximum number of datasets kept in memory. Default is 32.
+        directory (Optional[str]): If given, datasets are also pickled to this directory and reloaded
+            from there on a memory miss.
+        disk_maxsize (int): Maximum number of datasets kept in `directory`. Default is 256.
+        require_seed (bool): Only cache calls with a non-None `seed` argument. Default is True.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 32,
+        directory: Optional[str] = None,
+        disk_maxsize: int = 256,
+        require_seed: bool = True
+    ):
+        if maxsize < 1 or disk_maxsize < 1:
+            raise ValueError("cache sizes must be at least 1")
+        self.maxsize = maxsize
+        self.directory = directory
+        self.disk_maxsize = disk_maxsize
+        self.require_seed = require_seed
+        self.hits = self.misses = self.evictions = self.disk_hits = 0
+        self._entries = OrderedDict()
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def key(self, func, *args, **kwargs) -> Optional[str]:
+        """Returns the cache key for `func(*args, **kwargs)`, or None if the call should not be cached."""
+        bound = inspect.signature(func).bind(*args, **kwargs)
+        bound.apply_defaults()
+        arguments = bound.arguments
+        if self.require_seed and arguments.get('seed') is None:
+            return None
+        identity = (func.__module__, func.__qualname__, sorted(arguments.items()))
+        if func.__module__ == __name__ and func.__qualname__ in _DATED_GENERATORS:
+            identity += (date.today().isoformat(),)
+        identity = repr(identity)
+        return hashlib.sha256(identity.encode('utf-8')).hexdigest()
+
+    def get_or_generate(self, func, *args, **kwargs):
+        """
+        Returns the cached result of `func(*args, **kwargs)`, calling `func` and caching the result on a miss.
+        """
+        key = self.key(func, *args, **kwargs)
+        if key is None:
+            self.misses += 1
+            return func(*args, **kwargs)
+        entries = self._entries
+        if key in entries:
+            entries.move_to_end(key)
+            self.hits += 1
+            return entries[key]
+        result = self._load(key)
+        if result is not _MISSING:
+            self.disk_hits += 1
+        else:
+            self.misses += 1
+            result = func(*args, **kwargs)
+            if isinstance(result, (Iterator, AsyncIterator)):
+                return result
+            self._store(key, result)
+        entries[key] = result
+        if len(entries) > self.maxsize:
+            entries.popitem(last=False)
+            self.evictions += 1
+        return result
+
+    def __call__(self, func):
+        """Decorator form: `@DatasetCache()` routes every call of `func` through the cache."""
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            return self.get_or_generate(func, *args, **kwargs)
+        return wrapper
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + '.pkl')
+
+    def _load(self, key: str):
+        if self.directory is None:
+            return _MISSING
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as file:
+                result = pickle.load(file)
+        except FileNotFoundError:
+            return _MISSING
+        os.utime(path)
+        return result
+
+    def _store(self, key: str, result) -> None:
+        if self.directory is None:
+            return
+        path = self._path(key)
+        temporary = f'{path}.{os.getpid()}.tmp'
+        with open(temporary, 'wb') as file:
+            pickle.dump(result, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary, path)
+        stored = [
+            os.path.join(self.directory, name) for name in os.listdir(self.directory) if name.endswith('.pkl')
+        ]
+        if len(stored) > self.disk_maxsize:
+            stored.sort(key=os.path.getmtime)
+            for stale in stored[:len(stored) - self.disk_maxsize]:
+                os.remove(stale)
+                self.evictions += 1
+
+    def info(self) -> CacheInfo:
+        """Returns hit, miss, eviction and disk hit counts with the current and maximum in-memory size."""
+        return CacheInfo(self.hits, self.misses, self.evictions, self.disk_hits, len(self._entries), self.maxsize)
+
+    def clear(self) -> None:
+        """Drops every in-memory entry and resets the statistics. Files on disk are kept."""
+        self._entries.clear()
+        self.hits = self.misses = self.evictions = self.disk_hits = 0
+
+# Shared in-memory cache for generated datasets
+dataset_cache = DatasetCache()
+
+def cached_dataset(func, *args, **kwargs):
+    """
+    Returns `func(*args, **kwargs)` through the shared `dataset_cache`.
+
+    Example:
+        >>> profiles = cached_dataset(generate_profiles_namedtuple, 10000, fast=True, seed=1)
+    """
+    return dataset_cache.get_or_generate(func, *args, **kwargs)
+
+"""
+--------------------------------------------------------------------------------------------------------------
+Asyncio API: profile batches and stock index snapshots produced without blocking the event loop, through
+bounded queues so a slow consumer holds back the producer instead of letting batches pile up.
+--------------------------------------------------------------------------------------------------------------
+"""
+
+# One tick of a streamed market index: the tick number and the index open, high, low and current value
+MarketSnapshot = namedtuple('MarketSnapshot', 'tick open high low value')
+
+# Queue marker for the end of a buffered stream
+_END_OF_STREAM = object()
+
+async def _abuffered(source, maxsize: int):
+    """
+    Yields the items of the async iterator `source`, which runs ahead in its own task by at most `maxsize`
+    items. Errors raised by the source are re-raised in the consumer, and closing the consumer cancels it.
+    """
+    import asyncio
+    queue = asyncio.Queue(maxsize)
+
+    async def produce():
+        try:
+            async for item in source:
+                await queue.put((item, None))
+        except Exception as error:
+            await queue.put((_END_OF_STREAM, error))
+        else:
+            await queue.put((_END_OF_STREAM, None))
+        finally:
+            await source.aclose()
+
+    producer = asyncio.ensure_future(produce())
+    try:
+        while True:
+            item, error = await queue.get()
+            if error is not None:
+                raise error
+            if item is _END_OF_STREAM:
+                return
+            yield item
+    finally:
+        producer.cancel()
+        try:
+            await producer
+        except asyncio.CancelledError:
+            pass
+
+def agenerate_profiles(
+    n: int,
+    chunk_size: int = 10000,
+    fast: bool = False,
+    seed: Optional[int] = None,
+    maxsize: int = 2,
+    executor=None,
+    rng: Optional[random.Random] = None
+):
+    """
+    Asynchronously yields `n` profiles as ProfileTable batches.
+
+    Each batch is generated in `executor` (the event loop's default thread pool if None; a process pool
+    works too), so the event loop keeps serving other coroutines meanwhile. Generation runs ahead of the
+    consumer by at most `maxsize` batches.
+
+    Every batch has its own seed derived from `seed`, so with `chunk_size=10000` the batches concatenate to
+    the same profiles as `generate_profiles_table(n, fast=fast, seed=seed, workers=1)`.
+
+    Args:
+        n (int): Total number of profiles to generate.
+        chunk_size (int): Maximum number of profiles per batch. Default is 10000.
+        fast (bool): If True, draw only the needed fields in bulk instead of calling `profile()` per row.
+        seed (Optional[int]): Master seed. A random one is picked if None.
+        maxsize (int): Maximum number of batches generated ahead of the consumer. Default is 2.
+        executor: The `concurrent.futures` executor to generate batches in.
+        rng (Optional[random.Random]): Random source for the master seed instead of `seed`.
+
+    Returns:
+        An async iterator of ProfileTable batches of at most `chunk_size` profiles.
+
+    Raises:
+        ValueError: If chunk_size or maxsize is not positive, or both seed and rng are given.
+
+    Example:
+        >>> async for batch in agenerate_profiles(100000, fast=True):
+        ...     accumulator.update(batch)
+    """
+    import asyncio
+    if chunk_size <= 0:
+        raise ValueError("chunk_size must be positive")
+    if maxsize < 1:
+        raise ValueError("maxsize must be at least 1")
+    seed = _master_seed(seed, _resolve_rng(seed, rng, 'profiles', random.SystemRandom()))
+    sizes = [min(chunk_size, n - start) for start in range(0, n, chunk_size)]
+
+    async def produce():
+        loop = asyncio.get_running_loop()
+        for size, shard_seed in zip(sizes, _shard_seeds(seed, len(sizes))):
+            yield await loop.run_in_executor(executor, _generate_profile_shard, size, shard_seed, fast, False)
+
+    return _abuffered(produce(), maxsize)
+
+def astream_stock_snapshots(
+    stocks=None,
+    ticks: int = 390,
+    seed: Optional[int] = None,
+    interval: float = 0.0,
+    maxsize: int = 64,
+    executor=None,
+    rng: Optional[random.Random] = None
+):
+    """
+    Asynchronously yields a MarketSnapshot of the weighted market index for every tick of a simulated day.
+
+    The index path is computed in `executor` by `simulate_intraday`, which folds each stock's weighted path
+    into one running array, so memory stays O(ticks) rather than O(stocks x ticks). The path is then
+    replayed tick by tick with the running index high and low. Between ticks the stream waits `interval`
+    seconds, or just yields to the event loop when `interval` is 0. Snapshots are produced ahead of the
+    consumer by at most `maxsize`.
+
+    Args:
+        stocks: Stock namedtuples or a StockBook. If None, `generate_stock_data()` runs in the executor,
+            with the same seed, or with a generator seeded from `rng`.
+        ticks (int): Number of ticks in the trading day, including open and close. Default is 390.
+        seed (Optional[int]): Seed for the simulated paths and any generated stocks. The same seed gives the
+            path of `simulate_intraday`.
+        interval (float): Seconds to wait between ticks. Default is 0.0.
+        maxsize (int): Maximum number of snapshots produced ahead of the consumer. Default is 64.
+        executor: The `concurrent.futures` executor for stock generation and path simulation.
+        rng (Optional[random.Random]): Random source for the paths instead of a seed.
+
+    Returns:
+        An async iterator of MarketSnapshot: the tick number and the index open, high, low and current value.
+
+    Raises:
+        ValueError: If ticks is less than 4, maxsize is not positive or both seed and rng are given, and
+            while iterating if there are no stocks.
+    """
+    import asyncio
+    if ticks < 4:
+        raise ValueError("ticks must be at least 4")
+    if maxsize < 1:
+        raise ValueError("maxsize must be at least 1")
+    paths_rng = _resolve_rng(seed, rng, 'intraday')
+    if seed is not None:
+        stock_source = {'seed': seed}
+    elif rng is not None:
+        stock_source = {'rng': random.Random(rng.getrandbits(64))}
+    else:
+        stock_source = {}
+
+    async def produce():
+        loop = asyncio.get_running_loop()
+        constituents = stocks
+        if constituents is None:
+            constituents = await loop.run_in_executor(executor, lambda: generate_stock_data(**stock_source))
+        index = await loop.run_in_executor(executor, lambda: simulate_intraday(constituents, ticks, rng=paths_rng))
+        open_value = high = low = index.open
+        for tick, value in enumerate(index.path):
+            if value > high:
+                high = value
+            elif value < low:
+                low = value
+            yield MarketSnapshot(tick, round(open_value, 4), round(high, 4), round(low, 4), round(value, 4))
+            await asyncio.sleep(interval)
+
+    return _abuffered(produce(), maxsize)
+
+async def aconsume_profiles(batches, accumulator: Optional[ProfileAccumulator] = None) -> ProfileAccumulator:
+    """
+    Folds every batch of an async profile stream into a ProfileAccumulator.
+
+    Run it as a task next to other consumers; passing in an accumulator lets a dashboard read partial
+    metrics from it while the stream is still running.
+
+    Args:
+        batches: An async iterable of profile batches, such as `agenerate_profiles(...)`.
+        accumulator (Optional[ProfileAccumulator]): The accumulator to update. A new one is created if None.
+
+    Returns:
+        ProfileAccumulator: The updated accumulator.
+    """
+    if accumulator is None:
+        accumulator = ProfileAccumulator()
+    async for batch in batches:
+        accumulator.update(batch)
+    return accumulator
+
+"""
+--------------------------------------------------------------------------------------------------------------
+Spatial analytics over profile locations: a spherical centroid, geohash bucketing and a grid index for radius
+and nearest-profile queries measured along the Earth's surface.
+--------------------------------------------------------------------------------------------------------------
+"""
+
+# Mean Earth radius in kilometres (IUGG)
+EARTH_RADIUS_KM = 6371.0088
+
+_GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+# Number of profiles in one geohash cell and their average age
+GeoCell = namedtuple('GeoCell', 'count average_age')
+
+def _grid_cells(latitudes, longitudes, rows: int, columns: int):
+    """
+    Yields the grid cell number of every location on a grid of `rows` equal bands of latitude by
+    `columns` equal bands of longitude.
+
+    Cells are numbered row by row from the south-west corner. Latitude 90 falls into the top row and
+    longitude 180 wraps around to the first column. The arithmetic runs in `map` chains of C functions.
+    """
+    row_numbers = map(int, map(mul, map(add, latitudes, repeat(90.0)), repeat(rows / 180.0)))
+    column_numbers = map(int, map(mul, map(add, longitudes, repeat(180.0)), repeat(columns / 360.0)))
+    return map(
+        add,
+        map(mul, map(min, row_numbers, repeat(rows - 1)), repeat(columns)),
+        map(mod, column_numbers, repeat(columns))
+    )
+
+def haversine_km(latitude1: float, longitude1: float, latitude2: float, longitude2: float) -> float:
+    """Returns the great-circle distance in kilometres between two points given in degrees."""
+    phi1, phi2 = math.radians(latitude1), math.radians(latitude2)
+    half_dphi = (phi2 - phi1) / 2.0
+    half_dlambda = math.radians(longitude2 - longitude1) / 2.0
+    h = math.sin(half_dphi) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(half_dlambda) ** 2
+    return 2.0 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(h)))
+
+@timing_decorator
+def spherical_centroid(profiles) -> Optional[Tuple[float, float]]:
+    """
+    Returns the geographic centre of the profile locations.
+
+    Every location is turned into a unit vector on the sphere, the vectors are averaged and the mean is
+    projected back to latitude and longitude. Unlike the arithmetic mean of the coordinates this is correct
+    across the antimeridian and near the poles: the centre of points at longitudes 179 and -179 is on
+    the 180th meridian, not on the prime meridian.
+
+    Args:
+        profiles: Profile namedtuples, profile dictionaries or a ProfileTable.
+
+    Returns:
+        Optional[Tuple[float, float]]: The (latitude, longitude) of the centre, or None if there are no
+        profiles or the locations cancel out (such as two antipodal points).
+    """
+    table = _as_table(profiles)
+    latitudes, longitudes = table.latitudes, table.longitudes
+    if not len(latitudes):
+        return None
+    phis = array('d', map(math.radians, latitudes))
+    lambdas = array('d', map(math.radians, longitudes))
+    cos_phis = array('d', map(math.cos, phis))
+    x = _weighted_sum(cos_phis, array('d', map(math.cos, lambdas)))
+    y = _weighted_sum(cos_phis, array('d', map(math.sin, lambdas)))
+    z = math.fsum(map(math.sin, phis))
+    if math.hypot(x, y, z) < 1e-9 * len(latitudes):
+        return None
+    return math.degrees(math.atan2(z, math.hypot(x, y))), math.degrees(math.atan2(y, x))
+
+def _geohash_bits(precision: int) -> Tuple[int, int]:
+    """Returns the number of latitude and longitude bits of a geohash with `precision` characters."""
+    bits = 5 * precision
+    return bits // 2, bits - bits // 2
+
+def _geohash_of_cell(row: int, column: int, precision: int) -> str:
+    """Returns the geohash of the cell in latitude `row` and longitude `column` at `precision`."""
+    lat_bits, lon_bits = _geohash_bits(precision)
+    value = 0
+    for bit in range(lon_bits):
+        value = value << 1 | column >> (lon_bits - 1 - bit) & 1
+        if bit < lat_bits:
+            value = value << 1 | row >> (lat_bits - 1 - bit) & 1
+    return ''.join(_GEOHASH_ALPHABET[value >> shift & 31] for shift in range(5 * precision - 5, -1, -5))
+
+def geohash(latitude: float, longitude: float, precision: int = 7) -> str:
+    """
+    Returns the geohash of a location.
+
+    Args:
+        latitude (float): Latitude in degrees.
+        longitude (float): Longitude in degrees.
+        precision (int): Number of characters. Each character narrows the cell by 5 bits. Default is 7.
+
+    Returns:
+        str: The geohash, such as 'u4pruyd' for (57.64911, 10.40744).
+
+    Raises:
+        ValueError: If precision is not between 1 and 12.
+    """
+    if not 1 <= precision <= 12:
+        raise ValueError("precision must be between 1 and 12")
+    lat_bits, lon_bits = _geohash_bits(precision)
+    cell = next(_grid_cells((latitude,), (longitude,), 1 << lat_bits, 1 << lon_bits))
+    return _geohash_of_cell(*divmod(cell, 1 << lon_bits), precision)
+
+@timing_decorator
+def geohash_buckets(profiles, precision: int = 4) -> Dict[str, GeoCell]:
+    """
+    Groups the profiles by the geohash cell of their location.
+
+    Cell numbers are computed arithmetically for every profile and only the occupied cells are turned into
+    geohash strings, so the cost per profile is a few float operations.
+
+    Args:
+        profiles: Profile namedtuples, profile dictionaries or a ProfileTable.
+        precision (int): Geohash length. Precision 4 cells are about 39 by 20 km. Default is 4.
+
+    Returns:
+        Dict[str, GeoCell]: Each occupied geohash mapped to its profile count and average age rounded to
+        two decimals.
+
+    Raises:
+        ValueError: If precision is not between 1 and 12.
+    """
+    if not 1 <= precision <= 12:
+        raise ValueError("precision must be between 1 and 12")
+    table = _as_table(profiles)
+    lat_bits, lon_bits = _geohash_bits(precision)
+    cells = _grid_cells(table.latitudes, table.longitudes, 1 << lat_bits, 1 << lon_bits)
+    counts = {}
+    age_sums = {}
+    count_of = counts.get
+    age_sum_of = age_sums.get
+    for cell, age in zip(cells, table.ages):
+        counts[cell] = count_of(cell, 0) + 1
+        age_sums[cell] = age_sum_of(cell, 0) + age
+    return {
+        _geohash_of_cell(*divmod(cell, 1 << lon_bits), precision): GeoCell(count, round(age_sums[cell] / count, 2))
+        for cell, count in counts.items()
+    }
+
+class SpatialIndex:
+    """
+    Grid index over profile locations for radius and nearest-profile queries.
+
+    The globe is divided into cells of about `cell_degrees` by `cell_degrees`, and each occupied cell keeps
+    the row ids of its profiles in an `array('I')`. The cell size is adjusted so a whole number of rows and
+    columns spans the globe, so the last column meets the first at the antimeridian. A radius query only visits the cells overlapping the
+    query's bounding box on the sphere, which is widened to all longitudes near the poles and wraps
+    around the antimeridian, and measures exact haversine distances inside them.
+
+    Attributes:
+        latitudes (array): Latitude of each row ('d').
+        longitudes (array): Longitude of each row ('d').
+        cell_degrees (float): Size of a grid cell in degrees.
+    """
+    __slots__ = ('latitudes', 'longitudes', 'cell_degrees', '_rows', '_columns', '_lat_step', '_lon_step', '_cells')
+
+    def __init__(self, profiles, cell_degrees: float = 1.0):
+        """
+        Builds the index.
+
+        Args:
+            profiles: Profile namedtuples, profile dictionaries or a ProfileTable. Row ids are positions in it.
+            cell_degrees (float): Grid cell size in degrees. Smaller cells suit denser data. Default is 1.0.
+
+        Raises:
+            ValueError: If cell_degrees is not positive.
+        """
+        if cell_degrees <= 0:
+            raise ValueError("cell_degrees must be positive")
+        table = _as_table(profiles)
+        self.latitudes, self.longitudes = table.latitudes, table.longitudes
+        self.cell_degrees = cell_degrees
+        self._rows = max(1, round(180.0 / cell_degrees))
+        self._columns = max(1, round(360.0 / cell_degrees))
+        self._lat_step = 180.0 / self._rows
+        self._lon_step = 360.0 / self._columns
+        cells = {}
+        get = cells.get
+        for row_id, cell in enumerate(_grid_cells(self.latitudes, self.longitudes, self._rows, self._columns)):
+            bucket = get(cell)
+            if bucket is None:
+                bucket = cells[cell] = array('I')
+            bucket.append(row_id)
+        self._cells = cells
+
+    def __len__(self) -> int:
+        return len(self.latitudes)
+
+    def within(self, latitude: float, longitude: float, radius_km: float) -> List[Tuple[float, int]]:
+        """
+        Returns every profile within `radius_km` of a location.
+
+        Args:
+            latitude (float): Latitude of the query point in degrees.
+            longitude (float): Longitude of the query point in degrees.
+            radius_km (float): Search radius in kilometres.
+
+        Returns:
+            List[Tuple[float, int]]: (distance in km, row id) pairs, nearest first.
+        """
+        lat_step, lon_step = self._lat_step, self._lon_step
+        angle = radius_km / EARTH_RADIUS_KM
+        south = latitude - math.degrees(angle)
+        north = latitude + math.degrees(angle)
+        first_row = max(0, int((south + 90.0) / lat_step))
+        last_row = min(self._rows - 1, int((north + 90.0) / lat_step))
+        if south <= -90.0 or north >= 90.0 or math.sin(angle) >= math.cos(math.radians(latitude)):
+            columns = range(self._columns)
+        else:
+            spread = math.degrees(math.asin(math.sin(angle) / math.cos(math.radians(latitude))))
+            first_column = int(math.floor((longitude - spread + 180.0) / lon_step))
+            last_column = int(math.floor((longitude + spread + 180.0) / lon_step))
+            if last_column - first_column + 1 >= self._columns:
+                columns = range(self._columns)
+            else:
+                columns = [column % self._columns for column in range(first_column, last_column + 1)]
+
+        phi = math.radians(latitude)
+        cos_phi = math.cos(phi)
+        lambda_ = math.radians(longitude)
+        radians, sin, cos, asin, sqrt = math.radians, math.sin, math.cos, math.asin, math.sqrt
+        latitudes, longitudes = self.latitudes, self.longitudes
+        limit = sin(min(angle, math.pi) / 2.0) ** 2
+        found = []
+        for row in range(first_row, last_row + 1):
+            for column in columns:
+                bucket = self._cells.get(row * self._columns + column)
+                if bucket is None:
+                    continue
+                for row_id in bucket:
+                    other_phi = radians(latitudes[row_id])
+                    half_dlambda = (radians(longitudes[row_id]) - lambda_) / 2.0
+                    h = sin((other_phi - phi) / 2.0) ** 2 + cos_phi * cos(other_phi) * sin(half_dlambda) ** 2
+                    if h <= limit:
+                        found.append((2.0 * EARTH_RADIUS_KM * asin(min(1.0, sqrt(h))), row_id))
+        found.sort()
+        return found
+
+    def nearest(self, latitude: float, longitude: float, k: int = 1) -> List[Tuple[float, int]]:
+        """
+        Returns the `k` profiles closest to a location.
+
+        Radius queries are repeated with a doubling radius, starting from one cell, until at least `k`
+        profiles are found. Every profile within the radius is found, so the nearest `k` among them are
+        the nearest overall.
+
+        Args:
+            latitude (float): Latitude of the query point in degrees.
+            longitude (float): Longitude of the query point in degrees.
+            k (int): Number of profiles to return. Default is 1.
+
+        Returns:
+            List[Tuple[float, int]]: Up to `k` (distance in km, row id) pairs, nearest first.
+
+        Raises:
+            ValueError: If k is less than 1.
+        """
+        if k < 1:
+            raise ValueError("k must be at least 1")
+        k = min(k, len(self))
+        radius = EARTH_RADIUS_KM * math.radians(self.cell_degrees)
+        while True:
+            found = self.within(latitude, longitude, radius)
+            if len(found) >= k or radius >= math.pi * EARTH_RADIUS_KM:
+                return found[:k]
+            radius *= 2.0
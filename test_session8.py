@@ -2,6 +2,7 @@ import pytest
 import os
 import inspect
 import re
+from datetime import date, timedelta
 from session8 import *
 import session8
 
@@ -480,4 +481,1135 @@ def test_stock_data_length():
     """
     expected_length=100
     stock_data=generate_stock_data(expected_length, 100, 2000)
-    assert len(stock_data) ==expected_length, f"Length of stock data tuple is {len(stock_data)}, expected {expected_length}."
\ No newline at end of file
+    assert len(stock_data) ==expected_length, f"Length of stock data tuple is {len(stock_data)}, expected {expected_length}."
+
+############################## Validations for Columnar ProfileTable ###########################
+
+SAMPLE_PROFILES = (
+    Profile('A+', -40.7, -74.0, 30),
+    Profile('B-', 34.0, 118.2, 25),
+    Profile('AB+', 41.8, -87.6, 35),
+    Profile('O-', -37.7, -122.4, 28),
+    Profile('A+', 40.7, 74.0, 40),
+    Profile('B-', -34.0, -118.2, 22),
+    Profile('AB+', 41.8, 87.6, 31),
+    Profile('A+', 37.7, -122.4, 29),
+)
+
+# Test 1: A ProfileTable built from namedtuples gives the same metrics as the namedtuples
+def test_profile_table_metrics_match_namedtuple():
+    """
+    Test that the namedtuple metric functions return the same values for a ProfileTable.
+    """
+    table = ProfileTable.from_profiles(SAMPLE_PROFILES)
+    assert len(table) == len(SAMPLE_PROFILES), "Table length does not match the number of profiles"
+    assert largest_blood_type_namedtuple(table) == 'A+', "Largest blood type mismatch for ProfileTable"
+    assert mean_current_location_namedtuple(table) == (10.45, -30.6), "Mean location mismatch for ProfileTable"
+    assert oldest_person_age_namedtuple(table) == 40, "Oldest age mismatch for ProfileTable"
+    assert average_age_namedtuple(table) == 30.0, "Average age mismatch for ProfileTable"
+
+# Test 2: Columns are typed arrays and rows round-trip back to Profile namedtuples
+def test_profile_table_columns_and_rows():
+    """
+    Test that a ProfileTable stores typed columns and yields Profile rows.
+    """
+    table = ProfileTable.from_profiles(profile._asdict() for profile in SAMPLE_PROFILES)
+    assert table.blood_codes.typecode == 'B', "Blood types should be stored as one-byte codes"
+    assert table.ages.typecode == 'H', "Ages should be stored as unsigned 16-bit integers"
+    assert tuple(table) == SAMPLE_PROFILES, "Rows should round-trip to the original profiles"
+    assert table[3] == SAMPLE_PROFILES[3], "Indexing should return the matching Profile"
+
+# Test 3: generate_profiles_table returns a ProfileTable of the requested size
+def test_generate_profiles_table():
+    """
+    Test that generate_profiles_table returns a ProfileTable with `n` rows.
+    """
+    table = generate_profiles_table(50)
+    assert isinstance(table, ProfileTable), "Result should be a ProfileTable"
+    assert len(table) == 50, "Profile count does not match"
+    assert largest_blood_type_namedtuple(table) in BLOOD_TYPES, "Unexpected blood type"
+
+
+############################## Validations for fused profile summary ###########################
+
+# Test 1: compute_profile_summary matches the individual namedtuple metrics
+def test_compute_profile_summary_namedtuple():
+    """
+    Test that a single fused pass returns the same values as the separate metric functions.
+    """
+    summary = compute_profile_summary(SAMPLE_PROFILES)
+    assert summary.count == 8, "Count mismatch"
+    assert summary.largest_blood_type == 'A+', "Largest blood type mismatch"
+    assert summary.mean_current_location == (10.45, -30.6), "Mean location mismatch"
+    assert summary.oldest_person_age == 40, "Oldest age mismatch"
+    assert summary.youngest_person_age == 22, "Youngest age mismatch"
+    assert summary.average_age == 30.0, "Average age mismatch"
+    assert summary.age_variance == pytest.approx(27.5), "Age variance mismatch"
+
+# Test 2: The dict representation, ProfileTable and a generator give the same summary
+def test_compute_profile_summary_representations():
+    """
+    Test that dictionaries, ProfileTable and one-shot iterators produce identical summaries.
+    """
+    expected = compute_profile_summary(SAMPLE_PROFILES)
+    assert compute_profile_summary([profile._asdict() for profile in SAMPLE_PROFILES]) == expected
+    assert compute_profile_summary(ProfileTable.from_profiles(SAMPLE_PROFILES)) == expected
+    assert compute_profile_summary(profile for profile in SAMPLE_PROFILES) == expected
+
+# Test 3: An empty collection returns an empty summary
+def test_compute_profile_summary_empty():
+    """
+    Test that an empty input returns a zero count and no metrics.
+    """
+    summary = compute_profile_summary(())
+    assert summary.count == 0, "Count should be zero"
+    assert summary.largest_blood_type is None, "No blood type expected for empty input"
+
+
+############################## Validations for bulk profile generation ###########################
+
+# Test 1: Fast generation returns the same types as the Faker path with values in Faker's ranges
+def test_generate_profiles_fast_ranges():
+    """
+    Test that fast=True returns Profile namedtuples with values in the ranges fake.profile() uses.
+    """
+    profiles = generate_profiles_namedtuple(2000, fast=True)
+    assert isinstance(profiles, tuple) and len(profiles) == 2000, "Fast mode should return a tuple of n profiles"
+    assert all(isinstance(profile, Profile) for profile in profiles), "All elements should be of type Profile"
+    assert {profile.blood_type for profile in profiles} <= set(BLOOD_TYPES), "Unexpected blood type"
+    assert all(-90 <= profile.latitude <= 90 for profile in profiles), "Latitude out of range"
+    assert all(-180 <= profile.longitude <= 180 for profile in profiles), "Longitude out of range"
+    assert all(0 <= profile.age <= 116 for profile in profiles), "Age out of range"
+
+# Test 2: A seed makes fast generation reproducible across representations
+def test_generate_profiles_fast_seed():
+    """
+    Test that the same seed yields the same rows for namedtuple, dict and table outputs.
+    """
+    profiles = generate_profiles_namedtuple(100, fast=True, seed=8)
+    assert profiles == generate_profiles_namedtuple(100, fast=True, seed=8), "Same seed should give same profiles"
+    assert [profile._asdict() for profile in profiles] == generate_profiles_dict(100, fast=True, seed=8)
+    assert tuple(generate_profiles_table(100, fast=True, seed=8)) == profiles
+
+
+############################## Validations for streaming profiles ###########################
+
+# Test 1: iter_profiles yields chunks that add up to n profiles
+def test_iter_profiles_chunks():
+    """
+    Test that iter_profiles yields tuples of at most chunk_size profiles totalling n.
+    """
+    chunks = list(iter_profiles(25, chunk_size=10, fast=True, seed=3))
+    assert [len(chunk) for chunk in chunks] == [10, 10, 5], "Unexpected chunk sizes"
+    assert all(isinstance(profile, Profile) for chunk in chunks for profile in chunk), "Chunks should hold Profiles"
+    with pytest.raises(ValueError):
+        next(iter_profiles(10, chunk_size=0))
+
+# Test 2: Accumulating chunk by chunk gives the same result as one pass over everything
+def test_profile_accumulator_streaming():
+    """
+    Test that a streamed ProfileAccumulator agrees with compute_profile_summary over the whole population.
+    """
+    chunks = list(iter_profiles(1000, chunk_size=128, fast=True, seed=4))
+    accumulator = ProfileAccumulator()
+    for chunk in chunks:
+        accumulator.update(chunk)
+    expected = compute_profile_summary(profile for chunk in chunks for profile in chunk)
+    summary = accumulator.summary()
+    assert summary._replace(mean_current_location=None) == expected._replace(mean_current_location=None)
+    assert summary.mean_current_location == pytest.approx(expected.mean_current_location), "Mean location mismatch"
+    assert accumulator.largest_blood_type() == expected.largest_blood_type
+    assert accumulator.oldest_person_age() == expected.oldest_person_age
+
+# Test 3: Accumulators over separate shards merge into the full result
+def test_profile_accumulator_merge():
+    """
+    Test that merging shard accumulators is equivalent to accumulating all profiles.
+    """
+    left = ProfileAccumulator().update(SAMPLE_PROFILES[:3])
+    right = ProfileAccumulator().update(ProfileTable.from_profiles(SAMPLE_PROFILES[3:]))
+    assert left.merge(right).summary() == compute_profile_summary(SAMPLE_PROFILES)
+    assert ProfileAccumulator().average_age() is None, "An empty accumulator has no average"
+
+# Test 4: Faker rows with Decimal coordinates mix with float shards
+def test_profile_accumulator_mixed_sources():
+    """
+    Test that an accumulator over Faker-generated rows merges with one over a ProfileTable shard.
+    """
+    faker_rows = generate_profiles_namedtuple(3, seed=1)
+    table_rows = generate_profiles_table(3, seed=2)
+    merged = ProfileAccumulator().update(faker_rows).merge(ProfileAccumulator().update(table_rows))
+    chained = ProfileAccumulator().update(faker_rows).update(table_rows)
+    expected = compute_profile_summary(faker_rows + tuple(table_rows))
+    assert merged.count == chained.count == 6, "Profile count does not match"
+    assert merged.mean_current_location() == pytest.approx(expected.mean_current_location)
+    assert chained.mean_current_location() == pytest.approx(expected.mean_current_location)
+    assert merged.average_age() == expected.average_age
+
+
+############################## Validations for sharded profile generation ###########################
+
+# Test 1: Sharded generation gives the same profiles for any worker count
+def test_sharded_generation_independent_of_workers(monkeypatch):
+    """
+    Test that the same master seed gives identical profiles with one worker and with a process pool.
+    """
+    monkeypatch.setattr(session8, '_SHARD_SIZE', 10)
+    single = generate_profiles_namedtuple(30, seed=5, workers=1)
+    pooled = generate_profiles_namedtuple(30, seed=5, workers=2)
+    assert len(single) == 30, "Profile count does not match"
+    assert single == pooled, "Worker count should not change the generated profiles"
+    assert generate_profiles_dict(30, fast=True, seed=5, workers=2) == [
+        profile._asdict() for profile in generate_profiles_namedtuple(30, fast=True, seed=5, workers=1)
+    ], "Dict and namedtuple outputs should hold the same rows"
+
+# Test 2: Sharded tables concatenate shards and reject invalid worker counts
+def test_sharded_generation_table():
+    """
+    Test that generate_profiles_table with workers returns a ProfileTable and validates workers.
+    """
+    table = generate_profiles_table(25000, fast=True, seed=6, workers=1)
+    assert isinstance(table, ProfileTable) and len(table) == 25000, "Sharded table size mismatch"
+    with pytest.raises(ValueError):
+        generate_profiles_table(10, fast=True, workers=0)
+
+# Test 3: Extending a table with a different blood type dictionary re-encodes the codes
+def test_profile_table_extend_reencodes():
+    """
+    Test that ProfileTable.extend keeps blood types correct when the dictionaries differ.
+    """
+    other = ProfileTable(blood_types=('O-', 'A+'))
+    other.append('A+', 1.0, 2.0, 3)
+    other.append('O-', 4.0, 5.0, 6)
+    table = ProfileTable()
+    table.extend(other)
+    assert tuple(table) == (Profile('A+', 1.0, 2.0, 3), Profile('O-', 4.0, 5.0, 6)), "Blood types were not re-encoded"
+
+
+############################## Validations for parallel profile metrics ###########################
+
+# Test 1: The parallel metrics agree with the sequential ones
+def test_parallel_metrics_match_sequential():
+    """
+    Test that workers=N computes the same metrics as the single-threaded functions.
+    """
+    table = generate_profiles_table(20000, fast=True, seed=9)
+    assert largest_blood_type_namedtuple(table, workers=3) == largest_blood_type_namedtuple(table)
+    assert mean_current_location_namedtuple(table, workers=3) == pytest.approx(mean_current_location_namedtuple(table))
+    assert oldest_person_age_namedtuple(table, workers=3) == oldest_person_age_namedtuple(table)
+    assert average_age_namedtuple(table, workers=3) == average_age_namedtuple(table)
+
+# Test 2: Namedtuple tuples and plain age tuples are accepted in parallel mode
+def test_parallel_metrics_with_tuples():
+    """
+    Test that workers=N accepts the same inputs as the sequential functions.
+    """
+    ages = tuple(profile.age for profile in SAMPLE_PROFILES)
+    assert largest_blood_type_namedtuple(SAMPLE_PROFILES, workers=2) == 'A+'
+    assert mean_current_location_namedtuple(SAMPLE_PROFILES, workers=2) == pytest.approx((10.45, -30.6))
+    assert oldest_person_age_namedtuple(ages, workers=2) == 40
+    assert average_age_namedtuple(ages, workers=1) == 30.0
+    with pytest.raises(ValueError):
+        average_age_namedtuple(ages, workers=0)
+
+
+############################## Validations for instrumentation ###########################
+
+# Test 1: Instrumented functions feed call counts and latency statistics to the registry
+def test_metrics_registry_records_calls():
+    """
+    Test that timing_decorator records calls, totals and percentiles in the metrics registry.
+    """
+    metrics.reset()
+    for _ in range(5):
+        oldest_person_age_namedtuple((30, 40, 50))
+    stats = metrics.stats('oldest_person_age_namedtuple')
+    assert stats['calls'] == 5, "Every call should be recorded"
+    assert 0 <= stats['min'] <= stats['p50'] <= stats['p99'] <= stats['max'], "Inconsistent latency statistics"
+    assert stats['total'] >= stats['max'], "Total should include every call"
+
+# Test 2: Recording can be disabled with the context manager
+def test_metrics_registry_disabled():
+    """
+    Test that no calls are recorded inside metrics.disabled().
+    """
+    metrics.reset()
+    with metrics.disabled():
+        average_age_namedtuple((30, 40))
+    assert metrics.stats('average_age_namedtuple') is None, "Calls should not be recorded while disabled"
+    assert metrics.enabled, "Recording should be re-enabled after the block"
+
+# Test 3: Statistics export to JSON and Prometheus text format
+def test_metrics_registry_exports():
+    """
+    Test that the registry exports valid JSON and Prometheus exposition lines.
+    """
+    import json
+    metrics.reset()
+    average_age_namedtuple((30, 40))
+    exported = json.loads(metrics.to_json())
+    assert exported['average_age_namedtuple']['calls'] == 1, "JSON export should contain the call count"
+    text = metrics.to_prometheus()
+    assert 'session8_function_seconds_count{function="average_age_namedtuple"} 1' in text
+    assert '# TYPE session8_function_seconds summary' in text
+
+
+############################## Validations for the benchmark harness ###########################
+
+# Test 1: Every benchmark contender computes the same metrics on the same data
+def test_benchmark_contenders_agree():
+    """
+    Test that all contenders in BENCHMARK_CONTENDERS produce the same four metrics for the sample profiles.
+    """
+    for name, (build, run) in BENCHMARK_CONTENDERS.items():
+        largest, location, oldest, average = run(build(SAMPLE_PROFILES))
+        assert largest == 'A+', f"{name}: largest blood type mismatch"
+        assert location == pytest.approx((10.45, -30.6)), f"{name}: mean location mismatch"
+        assert (oldest, average) == (40, 30.0), f"{name}: age metrics mismatch"
+
+# Test 2: run_benchmarks reports statistics for every contender and size
+def test_run_benchmarks_report():
+    """
+    Test that run_benchmarks returns one consistent, JSON-serializable entry per contender and size.
+    """
+    import json
+    report = run_benchmarks(sizes=(100, 200), repeats=3, warmup=0, seed=1)
+    assert len(report['results']) == 2 * len(BENCHMARK_CONTENDERS), "Missing benchmark entries"
+    for entry in report['results']:
+        assert entry['trials'] == 3, "Every entry should hold all trials"
+        assert 0 < entry['min'] <= entry['median'] <= entry['max'], "Inconsistent trial statistics"
+        assert entry['ci95'] >= 0, "Confidence interval should be non-negative"
+    assert json.loads(json.dumps(report)) == report, "Report should be JSON-serializable"
+    with pytest.raises(ValueError):
+        run_benchmarks(sizes=(10,), contenders=('unknown',))
+
+# Test 3: compare_benchmark_reports flags only significant slowdowns
+def test_compare_benchmark_reports():
+    """
+    Test that a clearly slower contender is reported as a regression and noise is not.
+    """
+    baseline = {'results': [
+        {'contender': 'dict', 'size': 10, 'mean': 1.0, 'ci95': 0.01},
+        {'contender': 'namedtuple', 'size': 10, 'mean': 1.0, 'ci95': 0.5},
+    ]}
+    current = {'results': [
+        {'contender': 'dict', 'size': 10, 'mean': 1.5, 'ci95': 0.01},
+        {'contender': 'namedtuple', 'size': 10, 'mean': 1.3, 'ci95': 0.5},
+    ]}
+    regressions = compare_benchmark_reports(current, baseline)
+    assert [(entry['contender'], entry['size']) for entry in regressions] == [('dict', 10)]
+    assert regressions[0]['ratio'] == pytest.approx(1.5)
+
+# Test 4: compare_performance declares a winner only when the confidence intervals separate
+def test_compare_performance_verdict_uses_intervals(monkeypatch):
+    """
+    Test that overlapping trial times give a within-noise verdict after max_repeats trials,
+    and separated trial times name the faster implementation.
+    """
+    calls = []
+
+    def noisy_trials(run, data, repeats, warmup):
+        calls.append(run)
+        return [1.0, 1.2, 0.9, 1.1, 1.0][:repeats]
+
+    monkeypatch.setattr(session8, '_time_trials', noisy_trials)
+    result = compare_performance(10, repeats=5, seed=1, max_repeats=20)
+    assert "within noise" in result, "Overlapping intervals should not produce a winner"
+    assert len(calls) == 8, "Batches should be added until max_repeats trials per implementation"
+
+    def separated_trials(run, data, repeats, warmup):
+        return [2.0, 2.1, 1.9, 2.0, 2.0] if run is session8._dict_metrics else [1.0, 1.1, 0.9, 1.0, 1.0]
+
+    monkeypatch.setattr(session8, '_time_trials', separated_trials)
+    assert compare_performance(10, seed=1) == "Namedtuple is 2.00 times faster than Dictionary."
+
+
+############################## Validations for memory profiling ###########################
+
+# Test 1: deep_sizeof follows containers and counts shared objects once
+def test_deep_sizeof():
+    """
+    Test that deep_sizeof includes referenced objects and does not double-count shared ones.
+    """
+    import sys
+    text = 'shared value'
+    assert deep_sizeof([text]) == sys.getsizeof([text]) + sys.getsizeof(text), "Referenced objects should be included"
+    assert deep_sizeof([text, text]) == sys.getsizeof([text, text]) + sys.getsizeof(text), "Shared objects counted once"
+    assert deep_sizeof(SAMPLE_PROFILES[0]) > sys.getsizeof(SAMPLE_PROFILES[0]), "Namedtuple fields should be included"
+
+# Test 2: compare_memory reports sizes and peaks for both representations
+def test_compare_memory_report():
+    """
+    Test that compare_memory reports total, per-row and peak bytes, with namedtuples smaller than dicts.
+    """
+    report = compare_memory(500, fast=True, seed=2)
+    for name in ('namedtuple', 'dict'):
+        entry = report[name]
+        assert entry['total_bytes'] > 0 and entry['bytes_per_row'] == entry['total_bytes'] / 500
+        assert entry['generation_peak_bytes'] > 0, f"{name}: generation peak should be measured"
+        assert set(entry['metric_peak_bytes']) >= {'largest_blood_type', 'mean_current_location', 'average_age'}
+    assert report['namedtuple']['bytes_per_row'] < report['dict']['bytes_per_row'], "Namedtuples should be smaller"
+
+
+############################## Validations for compact record types ###########################
+
+# Test 1: ProfileRecords work unchanged with the namedtuple metric functions
+def test_profile_records_with_existing_functions():
+    """
+    Test that slotted ProfileRecords give the same metrics as Profile namedtuples.
+    """
+    records = to_profile_records(SAMPLE_PROFILES)
+    ages = tuple(record.age for record in records)
+    assert largest_blood_type_namedtuple(records) == 'A+'
+    assert mean_current_location_namedtuple(records) == pytest.approx((10.45, -30.6))
+    assert (oldest_person_age_namedtuple(ages), average_age_namedtuple(ages)) == (40, 30.0)
+    assert compute_profile_summary(records) == compute_profile_summary(SAMPLE_PROFILES)
+
+# Test 2: Records follow the namedtuple protocol and have no per-instance dict
+def test_profile_record_protocol():
+    """
+    Test iteration, _asdict, _replace, equality, pickling and slots on ProfileRecord.
+    """
+    import pickle
+    record = ProfileRecord('A+', -40.7, -74.0, 30)
+    assert tuple(record) == tuple(SAMPLE_PROFILES[0]), "Iteration should yield the fields in order"
+    assert record._asdict() == SAMPLE_PROFILES[0]._asdict(), "_asdict should match the namedtuple"
+    assert record._replace(age=31).age == 31 and record.age == 30, "_replace should return a new record"
+    assert pickle.loads(pickle.dumps(record)) == record, "Records should survive pickling"
+    assert not hasattr(record, '__dict__'), "Records should not carry a per-instance dict"
+    assert record.blood_type is ProfileRecord('A+', 0.0, 0.0, 1).blood_type, "Blood types should be interned"
+
+# Test 3: StockRecords work unchanged with calculate_market_values
+def test_stock_records_with_market_values(stock_data):
+    """
+    Test that StockRecords give the same market values as Stock namedtuples.
+    """
+    records = to_stock_records(stock_data)
+    assert all(isinstance(record, StockRecord) for record in records), "Conversion should yield StockRecords"
+    assert calculate_market_values(records) == calculate_market_values(stock_data), "Market values should match"
+
+
+############################## Validations for the columnar StockBook ###########################
+
+# Test 1: calculate_market_values gives the same values for a StockBook and the Stock tuple
+def test_stock_book_market_values(stock_data):
+    """
+    Test that a StockBook built from Stock namedtuples yields the same market values.
+    """
+    book = StockBook.from_stocks(stock_data)
+    assert len(book) == len(stock_data), "StockBook length mismatch"
+    assert book.opens.typecode == 'd', "Price columns should be float64 arrays"
+    assert tuple(book) == stock_data, "Rows should round-trip to the original Stock namedtuples"
+    assert calculate_market_values(book) == pytest.approx(calculate_market_values(stock_data), abs=1e-4)
+    assert calculate_market_values(book, precise=True) == calculate_market_values(stock_data, precise=True)
+
+# Test 2: Precise summation is exact where naive summation drifts
+def test_market_values_precise_summation():
+    """
+    Test that precise=True uses correctly rounded summation.
+    """
+    stocks = [Stock('Big', 'BIG', 1e16, 1e16, 1e16, 1e16, 1.0)]
+    stocks += [Stock(f'Small {index}', 'SML', 1.0, 1.0, 1.0, 1.0, 1.0) for index in range(10)]
+    stocks.append(Stock('Offset', 'OFF', -1e16, -1e16, -1e16, -1e16, 1.0))
+    assert calculate_market_values(StockBook.from_stocks(stocks), precise=True) == (10.0, 10.0, 10.0)
+    assert calculate_market_values(tuple(stocks), precise=True) == (10.0, 10.0, 10.0)
+
+
+############################## Validations for intraday simulation ###########################
+
+# Test 1: The simulated index opens and closes at the weighted open and close
+def test_simulate_intraday_matches_open_close(stock_data):
+    """
+    Test that the intraday index path starts and ends at the weighted open and close values.
+    """
+    index = simulate_intraday(stock_data, ticks=120, seed=1)
+    market_open, market_high, market_close = calculate_market_values(stock_data)
+    assert len(index.path) == 120, "Path should have one value per tick"
+    assert index.open == pytest.approx(market_open, abs=1e-3), "Index should open at the weighted open"
+    assert index.close == pytest.approx(market_close, abs=1e-3), "Index should close at the weighted close"
+
+# Test 2: The true index high and low lie within the weighted per-stock extremes
+def test_simulate_intraday_true_high_low(stock_data):
+    """
+    Test that the real index high never exceeds the weighted sum of highs and the low never undercuts the lows.
+    """
+    index = simulate_intraday(StockBook.from_stocks(stock_data), ticks=60, seed=2)
+    weighted_high = sum(stock.high * stock.weight for stock in stock_data)
+    weighted_low = sum(stock.low * stock.weight for stock in stock_data)
+    assert weighted_low - 1e-9 <= index.low <= index.close <= index.high <= weighted_high + 1e-9
+    assert index.high == max(index.path) and index.low == min(index.path)
+    assert simulate_intraday(stock_data, ticks=60, seed=2) == index, "Same seed should give the same path"
+    with pytest.raises(ValueError):
+        simulate_intraday(stock_data, ticks=3)
+
+# Test 3: Hand-built stocks with integer weights simulate like float weights
+def test_simulate_intraday_integer_weight():
+    """
+    Test that a stock with an integer weight gives the same path as the same stock weighted 1.0.
+    """
+    stock = Stock('Acme', 'ACM', 10.0, 12.0, 9.0, 11.0, 1)
+    index = simulate_intraday([stock], ticks=30, seed=3)
+    assert index == simulate_intraday([stock._replace(weight=1.0)], ticks=30, seed=3)
+    assert index.open == pytest.approx(10.0) and index.close == pytest.approx(11.0)
+
+
+############################## Validations for the live MarketIndex ###########################
+
+# Test 1: Incremental updates give the same value as recomputing the market values
+def test_market_index_matches_recomputation(stock_data):
+    """
+    Test that MarketIndex.update agrees with calculate_market_values on the replaced stocks.
+    """
+    index = MarketIndex(stock_data)
+    assert round(index.value, 4) == calculate_market_values(stock_data)[0], "Index should start at the market open"
+    stocks = list(stock_data)
+    for position in (0, 3, 7):
+        new_price = stocks[position].open * 1.05
+        stocks[position] = stocks[position]._replace(open=new_price)
+        index.update(stocks[position].symbol, new_price)
+    assert index.value == pytest.approx(calculate_market_values(tuple(stocks), precise=True)[0], abs=1e-4)
+    assert index.updates == 3, "Every update should be counted"
+
+# Test 2: The running high and low follow the index value
+def test_market_index_high_low(stock_data):
+    """
+    Test that update_many tracks the running high and low and matches single updates.
+    """
+    symbol = stock_data[0].symbol
+    events = [(symbol, price) for price in (1.0, 5000.0, 20.0)]
+    batched = MarketIndex(stock_data)
+    single = MarketIndex(stock_data)
+    batched.update_many(events)
+    for event in events:
+        single.update(*event)
+    assert batched.snapshot() == single.snapshot(), "Batched and single updates should agree"
+    assert batched.high >= batched.open >= batched.low, "Open should lie between the running high and low"
+    assert batched.price(symbol) == 20.0, "Last price should be kept"
+    with pytest.raises(KeyError):
+        batched.update('???', 1.0)
+
+# Test 3: Periodic resynchronisation keeps the running sum exact
+def test_market_index_resync(stock_data):
+    """
+    Test that the running value is recomputed exactly every resync_interval updates.
+    """
+    index = MarketIndex(stock_data, price='close', resync_interval=5)
+    symbols = [stock.symbol for stock in stock_data]
+    index.update_many((symbol, 100.0 + position) for position, symbol in enumerate(symbols))
+    assert index.value == index.resync(), "Value should equal an exact recomputation"
+    with pytest.raises(ValueError):
+        MarketIndex(stock_data, price='weight')
+
+
+############################## Validations for ticker symbol allocation ###########################
+
+# Test 1: The allocator exhausts a symbol space exactly once, then falls back to longer symbols
+def test_symbol_allocator_exhausts_space():
+    """
+    Test that every symbol is handed out once and longer symbols follow when the short space is used up.
+    """
+    allocator = SymbolAllocator(lengths=(1, 2))
+    single = [allocator.allocate('Acme Corp') for _ in range(26)]
+    assert sorted(single) == [chr(65 + letter) for letter in range(26)], "All 1-letter symbols should be used once"
+    assert len(allocator.allocate('Acme Corp')) == 2, "Allocation should fall back to the next length"
+    exhausted = SymbolAllocator(lengths=(1,))
+    for _ in range(26):
+        exhausted.allocate()
+    with pytest.raises(ValueError):
+        exhausted.allocate()
+
+# Test 2: Name-derived symbols are preferred while they are free
+def test_symbol_allocator_prefers_name_letters():
+    """
+    Test that the first symbol for a company is built from the letters of its name.
+    """
+    symbol = SymbolAllocator().allocate('Abba')
+    assert set(symbol) <= {'A', 'B'} and len(symbol) == 3, "Symbol should come from the company name"
+
+# Test 3: Large universes near the 3-letter limit finish with unique symbols
+def test_generate_stock_data_many_unique_symbols():
+    """
+    Test that generate_stock_data can fill most of the 3-letter space without hanging.
+    """
+    stocks = generate_stock_data(17000)
+    symbols = [stock.symbol for stock in stocks]
+    assert len(set(symbols)) == 17000, "Symbols should be unique"
+    assert all(symbol.isalpha() and len(symbol) == 3 for symbol in symbols), "All symbols should fit in 3 letters"
+
+
+############################## Validations for on-disk columnar datasets ###########################
+
+# Test 1: Profiles round-trip through the column file and the metrics run on the mapped data
+def test_save_and_load_profiles(tmp_path):
+    """
+    Test that load_profiles returns a memory-mapped ProfileTable with the saved rows.
+    """
+    path = str(tmp_path / 'profiles.s8')
+    save_profiles(path, SAMPLE_PROFILES)
+    table = load_profiles(path)
+    assert isinstance(table, ProfileTable) and isinstance(table.latitudes, memoryview), "Columns should be mapped"
+    assert tuple(table) == SAMPLE_PROFILES, "Rows should round-trip"
+    assert largest_blood_type_namedtuple(table) == 'A+'
+    assert mean_current_location_namedtuple(table) == (10.45, -30.6)
+    assert (oldest_person_age_namedtuple(table), average_age_namedtuple(table, workers=2)) == (40, 30.0)
+    assert compute_profile_summary(table) == compute_profile_summary(SAMPLE_PROFILES)
+
+# Test 2: Stocks round-trip through the column file
+def test_save_and_load_stocks(tmp_path, stock_data):
+    """
+    Test that load_stocks returns a StockBook with the saved stocks and market values.
+    """
+    path = str(tmp_path / 'stocks.s8')
+    save_stocks(path, stock_data)
+    book = load_stocks(path)
+    assert tuple(book) == stock_data, "Stocks should round-trip"
+    assert calculate_market_values(book, precise=True) == calculate_market_values(stock_data, precise=True)
+
+# Test 3: Loading the wrong kind of file is rejected
+def test_load_rejects_wrong_file(tmp_path, stock_data):
+    """
+    Test that a stock file cannot be opened as profiles and arbitrary files are rejected.
+    """
+    path = str(tmp_path / 'stocks.s8')
+    save_stocks(path, stock_data)
+    with pytest.raises(ValueError):
+        load_profiles(path)
+    other = tmp_path / 'other.bin'
+    other.write_bytes(b'not a column file at all, just some bytes')
+    with pytest.raises(ValueError):
+        load_stocks(str(other))
+
+
+############################## Validations for the dataset cache ###########################
+
+# Test 1: Seeded calls are served from memory; unseeded calls are never cached
+def test_dataset_cache_hits_and_misses():
+    """
+    Test that repeated seeded calls hit the cache, equivalent argument spellings share an entry,
+    and unseeded calls always run the generator.
+    """
+    cache = DatasetCache()
+    first = cache.get_or_generate(generate_profiles_namedtuple, 50, fast=True, seed=1)
+    again = cache.get_or_generate(generate_profiles_namedtuple, n=50, seed=1, fast=True)
+    assert again is first, "The same seeded request should return the cached dataset"
+    cache.get_or_generate(generate_profiles_namedtuple, 50, fast=True)
+    assert cache.info()[:3] == (1, 2, 0), "Expected one hit, two misses and no evictions"
+    assert cache.info().size == 1, "Unseeded calls should not be stored"
+
+# Test 2: The least recently used entry is evicted when the cache is full
+def test_dataset_cache_lru_eviction():
+    """
+    Test that the cache keeps at most maxsize entries and evicts the least recently used one.
+    """
+    cache = DatasetCache(maxsize=2)
+    generate = cache(generate_profiles_dict)
+    generate(5, fast=True, seed=1)
+    generate(5, fast=True, seed=2)
+    generate(5, fast=True, seed=1)
+    generate(5, fast=True, seed=3)
+    assert cache.info().evictions == 1, "One entry should have been evicted"
+    generate(5, fast=True, seed=1)
+    assert cache.info().hits == 2, "The recently used entry should have survived"
+
+# Test 3: Datasets persist on disk between cache instances
+def test_dataset_cache_on_disk(tmp_path):
+    """
+    Test that a new cache over the same directory reloads datasets from disk.
+    """
+    directory = str(tmp_path / 'cache')
+    expected = DatasetCache(directory=directory).get_or_generate(generate_profiles_table, 20, fast=True, seed=4)
+    cache = DatasetCache(directory=directory)
+    assert tuple(cache.get_or_generate(generate_profiles_table, 20, fast=True, seed=4)) == tuple(expected)
+    assert cache.info().disk_hits == 1 and cache.info().misses == 0, "The dataset should come from disk"
+
+# Test 4: Profile entries are keyed by the generation date; stock entries are not
+def test_dataset_cache_key_includes_date(monkeypatch):
+    """
+    Test that a seeded profile dataset cached on one day is not served on the next.
+    """
+    cache = DatasetCache()
+    profile_key = cache.key(generate_profiles_namedtuple, 20, fast=True, seed=1)
+    stock_key = cache.key(generate_stock_data, 20, seed=1)
+
+    class Tomorrow(date):
+        @classmethod
+        def today(cls):
+            return date.today() + timedelta(days=1)
+
+    monkeypatch.setattr(session8, 'date', Tomorrow)
+    assert cache.key(generate_profiles_namedtuple, 20, fast=True, seed=1) != profile_key, "Key should change daily"
+    assert cache.key(generate_stock_data, 20, seed=1) == stock_key, "Stock data does not depend on the date"
+
+# Test 5: One-shot iterators are returned but never cached
+def test_dataset_cache_skips_iterators(tmp_path):
+    """
+    Test that seeded iter_profiles and agenerate_profiles results are regenerated on every call.
+    """
+    cache = DatasetCache(directory=str(tmp_path / 'cache'))
+    for _ in range(2):
+        assert len(list(cache.get_or_generate(iter_profiles, 10, chunk_size=4, fast=True, seed=1))) == 3
+    stream = cache.get_or_generate(agenerate_profiles, 10, fast=True, seed=1)
+    assert cache.get_or_generate(agenerate_profiles, 10, fast=True, seed=1) is not stream
+    assert cache.info().size == 0 and cache.info().misses == 4, "Iterators should not be stored"
+    assert os.listdir(tmp_path / 'cache') == [], "Iterators should not be written to disk"
+
+
+############################## Validations for import startup ###########################
+
+# Test 1: Importing the module does not load Faker
+def test_import_does_not_load_faker():
+    """
+    Test that a fresh `import session8` stays cheap by leaving Faker unloaded.
+    """
+    report = measure_startup(runs=1)
+    assert set(report) == {'runs', 'median_seconds', 'max_seconds', 'peak_rss_bytes', 'faker_loaded'}
+    assert report['faker_loaded'] is False, "Faker should only be imported on first use"
+    assert report['median_seconds'] > 0
+
+# Test 2: Seeded fast generation does not load Faker either
+def test_seeded_fast_generation_does_not_load_faker():
+    """
+    Test that seeded fast=True generation in a fresh interpreter never imports Faker.
+    """
+    import subprocess
+    import sys
+    script = (
+        "import sys, session8\n"
+        "session8.generate_profiles_namedtuple(10, fast=True, seed=1)\n"
+        "session8.generate_profiles_table(10, fast=True, rng=__import__('random').Random(1))\n"
+        "list(session8.iter_profiles(10, fast=True, seed=1))\n"
+        "print('faker' in sys.modules)\n"
+    )
+    directory = os.path.dirname(os.path.abspath(session8.__file__))
+    output = subprocess.run([sys.executable, '-c', script], cwd=directory, capture_output=True, text=True, check=True)
+    assert output.stdout.strip() == 'False', "Seeded fast generation should not import Faker"
+
+# Test 3: The shared Faker instance is still reachable as session8.fake
+def test_lazy_fake_attribute():
+    """
+    Test that the lazily created `fake` instance is created once and provides profiles and company names.
+    """
+    assert session8.fake is session8.fake, "The lazy Faker instance should be shared"
+    assert 'blood_group' in session8.fake.profile()
+    assert session8.fake.company()
+    with pytest.raises(AttributeError):
+        session8.no_such_attribute
+
+
+############################## Validations for the asyncio API ###########################
+
+# Test 1: Async batches concatenate to the same profiles as the synchronous generator
+def test_agenerate_profiles_matches_sync():
+    """
+    Test that agenerate_profiles yields ProfileTable batches of chunk_size that, in order, hold the same
+    profiles as generate_profiles_table with the same seed, and that aconsume_profiles folds them all.
+    """
+    import asyncio
+
+    async def collect():
+        return [batch async for batch in agenerate_profiles(25000, fast=True, seed=1)]
+
+    batches = asyncio.run(collect())
+    assert [len(batch) for batch in batches] == [10000, 10000, 5000]
+    table = ProfileTable()
+    for batch in batches:
+        table.extend(batch)
+    assert tuple(table) == tuple(generate_profiles_table(25000, fast=True, seed=1, workers=1))
+    accumulator = asyncio.run(aconsume_profiles(agenerate_profiles(250, chunk_size=100, fast=True, seed=1)))
+    assert accumulator.count == 250
+
+# Test 2: A slow consumer holds back the producer
+def test_agenerate_profiles_backpressure():
+    """
+    Test that generation runs at most maxsize batches ahead of a consumer that stops reading.
+    """
+    import asyncio
+    from concurrent.futures import ThreadPoolExecutor
+
+    class CountingExecutor(ThreadPoolExecutor):
+        submitted = 0
+
+        def submit(self, *args, **kwargs):
+            CountingExecutor.submitted += 1
+            return super().submit(*args, **kwargs)
+
+    async def read_one(executor):
+        stream = agenerate_profiles(1000, chunk_size=10, fast=True, seed=1, maxsize=1, executor=executor)
+        async for _ in stream:
+            await asyncio.sleep(0.2)
+            break
+        await stream.aclose()
+
+    with CountingExecutor(max_workers=1) as executor:
+        asyncio.run(read_one(executor))
+    assert CountingExecutor.submitted <= 3, "The producer should wait for the consumer instead of generating all batches"
+
+# Test 3: Streamed index snapshots follow the simulated intraday index
+def test_astream_stock_snapshots(stock_data):
+    """
+    Test that astream_stock_snapshots yields one snapshot per tick and ends at the open, high, low and
+    close of simulate_intraday with the same seed.
+    """
+    import asyncio
+
+    async def collect():
+        return [snapshot async for snapshot in astream_stock_snapshots(stock_data, ticks=60, seed=5)]
+
+    snapshots = asyncio.run(collect())
+    expected = simulate_intraday(stock_data, ticks=60, seed=5)
+    assert [snapshot.tick for snapshot in snapshots] == list(range(60))
+    last = snapshots[-1]
+    assert (last.open, last.high, last.low, last.value) == pytest.approx(expected[:4], abs=1e-3)
+    with pytest.raises(ValueError):
+        astream_stock_snapshots(stock_data, ticks=2)
+
+# Test 4: A seeded stream over generated stocks is reproducible
+def test_astream_stock_snapshots_seeded_stocks():
+    """
+    Test that without stocks the seed also fixes the generated constituents.
+    """
+    import asyncio
+
+    async def collect(**kwargs):
+        return [snapshot async for snapshot in astream_stock_snapshots(ticks=10, **kwargs)]
+
+    snapshots = asyncio.run(collect(seed=1))
+    assert snapshots == asyncio.run(collect(seed=1)), "The same seed should give the same snapshots"
+    expected = simulate_intraday(generate_stock_data(seed=1), ticks=10, seed=1)
+    assert [snapshot.value for snapshot in snapshots] == [round(value, 4) for value in expected.path]
+    assert asyncio.run(collect(rng=random.Random(2))) == asyncio.run(collect(rng=random.Random(2)))
+
+
+############################## Validations for the age view and age quantiles ###########################
+
+# Test 1: The age metrics run on a lazy view of the profiles
+def test_age_view_metrics():
+    """
+    Test that age_view projects the ages without copying them and that the age metrics accept it.
+    """
+    ages = age_view(SAMPLE_PROFILES)
+    assert isinstance(ages, AgeView) and ages.profiles is SAMPLE_PROFILES, "The view should not copy the profiles"
+    assert len(ages) == 8 and ages[4] == 40 and list(ages[:2]) == [30, 25]
+    assert oldest_person_age_namedtuple(ages) == 40
+    assert average_age_namedtuple(ages) == 30.0
+    assert average_age_namedtuple(ages, workers=2) == 30.0
+    table = ProfileTable.from_profiles(SAMPLE_PROFILES)
+    assert age_view(table) is table.ages, "A ProfileTable should hand out its own age column"
+
+# Test 2: Exact quantiles use the nearest-rank rule
+def test_age_quantiles_exact():
+    """
+    Test the exact age quantiles of the sample profiles, custom quantiles and the empty case.
+    """
+    assert age_quantiles(age_view(SAMPLE_PROFILES)) == {0.5: 30, 0.9: 40, 0.99: 40}
+    assert age_quantiles(ProfileTable.from_profiles(SAMPLE_PROFILES), quantiles=(0, 0.25)) == {0: 22, 0.25: 28}
+    assert age_quantiles(iter(())) == {0.5: None, 0.9: None, 0.99: None}
+    with pytest.raises(ValueError):
+        age_quantiles((30, 40), quantiles=(1.5,))
+
+# Test 3: Approximate quantiles from a reservoir sample are close to the exact ones
+def test_age_quantiles_approximate():
+    """
+    Test that the reservoir-sampled quantiles stay within a few years of the exact quantiles.
+    """
+    table = generate_profiles_table(50000, fast=True, seed=8)
+    exact = age_quantiles(table)
+    approximate = age_quantiles(table, approximate=True, sample_size=5000, seed=1)
+    assert set(approximate) == set(exact)
+    for quantile in exact:
+        assert abs(approximate[quantile] - exact[quantile]) <= 4, f"p{quantile * 100:g} is too far off"
+    assert age_quantiles(range(10), approximate=True, sample_size=100) == age_quantiles(range(10))
+
+# Test 4: One histogram pass over the rows feeds both age metrics
+def test_age_histogram_metrics():
+    """
+    Test that an AgeHistogram gives the same age metrics and quantiles as the ages themselves.
+    """
+    histogram = AgeHistogram.from_profiles(SAMPLE_PROFILES)
+    ages = tuple(profile.age for profile in SAMPLE_PROFILES)
+    assert set(histogram) == set(ages) and histogram.total() == len(ages)
+    assert oldest_person_age_namedtuple(histogram) == oldest_person_age_namedtuple(ages) == 40
+    assert average_age_namedtuple(histogram) == average_age_namedtuple(ages) == 30.0
+    assert average_age_namedtuple(histogram, workers=2) == 30.0
+    assert age_quantiles(histogram) == age_quantiles(ages)
+    assert age_quantiles(histogram, approximate=True, sample_size=100) == age_quantiles(ages)
+
+
+############################## Validations for the blood type index ###########################
+
+# Test 1: Index queries match the scanning metric functions
+def test_profile_index_queries():
+    """
+    Test that ProfileIndex answers the blood type, location and age metrics like the scanning functions,
+    and that the metric functions accept an index.
+    """
+    index = ProfileIndex(SAMPLE_PROFILES)
+    assert len(index) == 8 and index.row_ids('A+') == (0, 4, 7)
+    assert index.largest_blood_type() == largest_blood_type_namedtuple(index) == 'A+'
+    assert index.mean_current_location() == pytest.approx((10.45, -30.6))
+    assert mean_current_location_namedtuple(index) == pytest.approx((10.45, -30.6))
+    assert index.average_age() == average_age_namedtuple(index) == 30.0
+    assert oldest_person_age_namedtuple(index) == oldest_person_age_namedtuple(age_view(SAMPLE_PROFILES))
+    assert index.group_stats('B-') == (2, pytest.approx((0.0, 0.0)), 23.5)
+    assert index.average_age('AB+') == 33.0 and index.average_age('O+') is None
+    assert index.blood_type_counts() == {'A+': 3, 'B-': 2, 'AB+': 2, 'O-': 1}
+
+# Test 2: Appends and removals keep the groups up to date
+def test_profile_index_incremental():
+    """
+    Test that appending and removing rows updates the inverted index and the per-group aggregates,
+    and that row ids stay stable after removals.
+    """
+    index = ProfileIndex(SAMPLE_PROFILES)
+    for row_id in index.row_ids('A+'):
+        index.remove(row_id)
+    assert 'A+' not in index.groups() and len(index) == 5
+    assert index.largest_blood_type() in ('B-', 'AB+')
+    row_id = index.append({'blood_type': 'O-', 'latitude': 0.0, 'longitude': 0.0, 'age': 50})
+    assert row_id == 8 and index[row_id].age == 50
+    assert index.blood_type_counts()['O-'] == 2
+    assert index.average_age('O-') == 39.0
+    expected = ProfileIndex(profile for profile in index)
+    assert index.groups() == expected.groups(), "Incremental aggregates should match a rebuilt index"
+    with pytest.raises(KeyError):
+        index.remove(0)
+
+# Test 3: Faker rows with Decimal coordinates mix with float rows, and bad rows leave the index unchanged
+def test_profile_index_mixed_sources():
+    """
+    Test that an index over Faker-generated rows accepts fast rows, and that a failed append does not
+    leave a partial row behind.
+    """
+    faker_rows = generate_profiles_namedtuple(3, seed=1)
+    fast_rows = generate_profiles_namedtuple(3, fast=True, seed=2)
+    index = ProfileIndex(faker_rows)
+    index.extend(fast_rows)
+    assert len(index) == 6, "Profile count does not match"
+    expected = ProfileAccumulator().update(faker_rows).update(fast_rows)
+    assert index.mean_current_location() == pytest.approx(expected.mean_current_location())
+    assert index.average_age() == expected.average_age()
+
+    index = ProfileIndex([Profile('A+', 30.0, 40.0, 20)])
+    with pytest.raises(TypeError):
+        index.append(Profile('A+', None, 10.0, 20))
+    with pytest.raises(TypeError):
+        index.append(Profile('B-', 5.0, 10.0, None))
+    assert len(index) == 1 and 'B-' not in index.groups(), "A failed append should not change the index"
+    assert index.group_stats('A+') == (1, (30.0, 40.0), 20.0)
+
+
+############################## Validations for the multi-day market simulation ###########################
+
+# Test 1: Prices respect the OHLC constraints and chain from day to day
+def test_simulate_market_constraints():
+    """
+    Test that every simulated day keeps low <= open <= high and low <= close <= high, and that each
+    day opens at the previous day's close.
+    """
+    history = simulate_market(days=20, num_stocks=30, seed=1)
+    assert len(history) == 20 and len(history.opens) == 600
+    assert all(
+        low <= price <= high and low <= close <= high
+        for price, high, low, close in zip(history.opens, history.highs, history.lows, history.closes)
+    ), "OHLC constraints violated"
+    for day in range(1, 20):
+        assert list(history.day(day).opens) == list(history.day(day - 1).closes)
+    assert math.isclose(sum(history.weights), 1.0), "Weights should sum to 1"
+    assert len(set(history.symbols)) == 30, "Symbols should be unique"
+
+# Test 2: Daily index values come from calculate_market_values on each day
+def test_simulate_market_index_values():
+    """
+    Test that the stored daily index values match calculate_market_values on the day's StockBook,
+    and that the same seed reproduces the same market.
+    """
+    history = simulate_market(days=5, num_stocks=10, seed=2)
+    for day, book in enumerate(history):
+        assert isinstance(book, StockBook) and len(book) == 10
+        expected = calculate_market_values(book)
+        assert (history.index_opens[day], history.index_highs[day], history.index_closes[day]) == expected
+    assert history.day(-1)[0].close == history.closes[-10]
+    again = simulate_market(days=5, num_stocks=10, seed=2)
+    assert again.closes == history.closes and again.names == history.names and again.symbols == history.symbols
+    with pytest.raises(ValueError):
+        simulate_market(days=0)
+    with pytest.raises(IndexError):
+        history.day(5)
+
+
+############################## Validations for rolling index analytics ###########################
+
+# Test 1: Rolling statistics match a brute-force recomputation over each window
+def test_rolling_index_matches_brute_force():
+    """
+    Test the moving average, rolling high and low and rolling max drawdown of every day against
+    recomputing them from the window's daily index values.
+    """
+    history = simulate_market(days=60, num_stocks=15, seed=3)
+    window = 7
+    _, snapshots = RollingIndex.from_history(history, window)
+    lows = [round(sum(stock.low * stock.weight for stock in book), 4) for book in history]
+    for day, snapshot in enumerate(snapshots):
+        start = max(0, day - window + 1)
+        closes = history.index_closes[start:day + 1]
+        assert snapshot.close == history.index_closes[day]
+        assert snapshot.moving_average == pytest.approx(sum(closes) / len(closes), abs=1e-4)
+        assert snapshot.rolling_high == max(history.index_highs[start:day + 1])
+        assert snapshot.rolling_low == pytest.approx(min(lows[start:day + 1]))
+        drawdown = max(1 - close / max(closes[:k + 1]) for k, close in enumerate(closes))
+        assert snapshot.max_drawdown == pytest.approx(drawdown, abs=1e-12)
+
+# Test 2: Symbol contributions add up to the index move over the window
+def test_rolling_index_contributions(stock_data):
+    """
+    Test that per-symbol contributions sum to the index move from the window's first open to the last
+    close, and that days with different stocks are rejected.
+    """
+    rolling = RollingIndex(window=3)
+    assert rolling.snapshot() is None and rolling.contributions() == {}
+    history = simulate_market(days=5, num_stocks=8, seed=9)
+    for book in history:
+        rolling.append(tuple(book))
+    contributions = rolling.contributions()
+    assert set(contributions) == set(history.symbols)
+    assert sum(contributions.values()) == pytest.approx(history.index_closes[4] - history.index_opens[2], abs=1e-3)
+    assert rolling.snapshot().day == 4
+    with pytest.raises(ValueError):
+        rolling.append(stock_data)
+    with pytest.raises(ValueError):
+        RollingIndex(window=0)
+
+
+############################## Validations for weight normalization ###########################
+
+# Test 1: Every weighting scheme gives weights that sum to exactly 1
+def test_weighting_schemes_sum_to_one():
+    """
+    Test that generate_stock_data keeps full precision weights that sum to exactly 1 under math.fsum
+    for every scheme, and that the capped scheme respects its cap.
+    """
+    for scheme in WEIGHTING_SCHEMES:
+        stocks = generate_stock_data(40, weighting=scheme, cap=0.05)
+        weights = [stock.weight for stock in stocks]
+        assert math.fsum(weights) == 1.0, f"{scheme} weights do not sum to 1"
+        assert min(weights) > 0
+    equal = generate_stock_data(8, weighting='equal')
+    assert {stock.weight for stock in equal} == {0.125}
+    capped = stock_weights([1.0] * 9 + [1000.0], 'capped', cap=0.2, rng=random.Random(1))
+    assert max(capped) <= 0.2 + 1e-15 and math.fsum(capped) == 1.0
+    with pytest.raises(ValueError):
+        generate_stock_data(5, weighting='price')
+
+# Test 2: Normalization runs in place on a column
+def test_normalize_weights_in_place():
+    """
+    Test that normalize_weights rescales the given column itself and rejects invalid weights and caps.
+    """
+    from array import array
+    weights = array('d', [1.0, 2.0, 3.0, 4.0])
+    assert normalize_weights(weights) is weights
+    assert list(weights) == pytest.approx([0.1, 0.2, 0.3, 0.4]) and math.fsum(weights) == 1.0
+    values = [0.7, 0.1, 0.1, 0.1]
+    normalize_weights(values, cap=0.4)
+    assert values[0] == 0.4 and values[1:] == pytest.approx([0.2, 0.2, 0.2])
+    with pytest.raises(ValueError):
+        normalize_weights([1.0, -1.0, 2.0])
+    with pytest.raises(ValueError):
+        normalize_weights([1.0, 1.0], cap=0.4)
+    zero_padded = array('d', [1.0] + [0.0] * 10)
+    with pytest.raises(ValueError):
+        normalize_weights(zero_padded, cap=0.2)
+    assert list(zero_padded) == [1.0] + [0.0] * 10, "Rejected weights should be left unchanged"
+
+
+############################## Validations for deterministic seeding ###########################
+
+# Test 1: The same seed gives bit-identical output from every generator
+def test_seeded_generators_are_identical():
+    """
+    Test that Faker-based and fast profiles, stock data and simulated markets are reproduced exactly
+    from the same seed, and that a different seed gives different data.
+    """
+    assert generate_profiles_namedtuple(200, seed=5) == generate_profiles_namedtuple(200, seed=5)
+    assert generate_profiles_dict(200, seed=5) == generate_profiles_dict(200, seed=5)
+    assert tuple(generate_profiles_table(200, fast=True, seed=5)) == tuple(generate_profiles_table(200, fast=True, seed=5))
+    assert list(iter_profiles(200, 60, seed=5)) == list(iter_profiles(200, 60, seed=5))
+    assert generate_stock_data(30, seed=5) == generate_stock_data(30, seed=5)
+    assert generate_stock_data(30, seed=5) != generate_stock_data(30, seed=6)
+    assert simulate_intraday(generate_stock_data(5, seed=1), ticks=20, seed=5) == \
+        simulate_intraday(generate_stock_data(5, seed=1), ticks=20, seed=5)
+
+# Test 2: An explicit rng can replace the seed, and seeded calls leave the shared Faker alone
+def test_rng_parameter_and_shared_faker_state():
+    """
+    Test that equally seeded rng objects give identical data, that passing both seed and rng fails,
+    and that seeded generation does not disturb the shared Faker instance.
+    """
+    assert generate_stock_data(10, rng=random.Random(3)) == generate_stock_data(10, rng=random.Random(3))
+    assert generate_profiles_namedtuple(20, fast=True, rng=random.Random(3)) == \
+        generate_profiles_namedtuple(20, fast=True, rng=random.Random(3))
+    with pytest.raises(ValueError):
+        generate_profiles_namedtuple(10, seed=1, rng=random.Random(1))
+    state = session8.fake.random.getstate()
+    generate_profiles_namedtuple(20, seed=7)
+    generate_stock_data(5, seed=7)
+    assert session8.fake.random.getstate() == state, "Seeded calls should use their own Faker instance"
+
+
+############################## Validations for spatial analytics ###########################
+
+# Test 1: The spherical centroid handles the antimeridian, and geohashes match the reference encoding
+def test_spherical_centroid_and_geohash():
+    """
+    Test that the centroid of points on both sides of the antimeridian lies on it, that cancelling
+    points have no centroid, and that geohash agrees with the standard encoding.
+    """
+    latitude, longitude = spherical_centroid([Profile('A+', 10, 179, 30), Profile('B+', -10, -179, 40)])
+    assert latitude == pytest.approx(0.0, abs=1e-9) and abs(longitude) == pytest.approx(180.0)
+    assert spherical_centroid([Profile('A+', 0, 0, 30), Profile('B+', 0, 180, 40)]) is None
+    assert spherical_centroid(SAMPLE_PROFILES) == pytest.approx(spherical_centroid(ProfileTable.from_profiles(SAMPLE_PROFILES)))
+    assert geohash(57.64911, 10.40744, 11) == 'u4pruydqqvj'
+    assert geohash(-25.382708, -49.265506, 8) == '6gkzwgjz'
+
+# Test 2: Geohash buckets count profiles and average their ages per cell
+def test_geohash_buckets():
+    """
+    Test per-cell counts and average ages of geohash buckets.
+    """
+    profiles = (
+        Profile('A+', 57.649, 10.407, 20),
+        Profile('B+', 57.650, 10.408, 40),
+        Profile('O-', -25.382708, -49.265506, 33),
+    )
+    buckets = geohash_buckets(profiles, precision=5)
+    assert buckets == {'u4pru': GeoCell(2, 30.0), '6gkzw': GeoCell(1, 33.0)}
+    table = generate_profiles_table(5000, fast=True, seed=4)
+    assert sum(cell.count for cell in geohash_buckets(table, precision=2).values()) == 5000
+
+# Test 3: Radius and nearest queries match a brute-force scan
+def test_spatial_index_queries():
+    """
+    Test radius queries near a pole, across the antimeridian and over the whole globe, and k-nearest
+    queries, against checking the distance to every profile.
+    """
+    table = generate_profiles_table(2000, fast=True, seed=6)
+    index = SpatialIndex(table, cell_degrees=5.0)
+    locations = list(zip(table.latitudes, table.longitudes))
+    for latitude, longitude, radius in ((89.0, 20.0, 600.0), (5.0, 179.5, 900.0), (-30.0, 60.0, 25000.0)):
+        distances = sorted((haversine_km(latitude, longitude, *location), row) for row, location in enumerate(locations))
+        expected = [row for distance, row in distances if distance <= radius]
+        assert [row for _, row in index.within(latitude, longitude, radius)] == expected
+        assert [row for _, row in index.nearest(latitude, longitude, k=3)] == [row for _, row in distances[:3]]
+    with pytest.raises(ValueError):
+        index.nearest(0.0, 0.0, k=0)
+
+# Test 4: Cell sizes that do not divide 360 still wrap around the antimeridian
+def test_spatial_index_uneven_cells():
+    """
+    Test that profiles just past the antimeridian are found when the cell size does not divide 360.
+    """
+    profiles = [Profile('A+', 0.0, -179.95, 30), Profile('A+', 0.0, 179.95, 30)]
+    for cell_degrees in (0.7, 7.0):
+        index = SpatialIndex(profiles, cell_degrees=cell_degrees)
+        assert [row for _, row in index.within(0.0, 179.9, 30.0)] == [1, 0], "Row 0 is 16.7 km away"
+        assert [row for _, row in index.nearest(0.0, -179.9, k=2)] == [0, 1]